@@ -1,17 +1,53 @@
+import re
+import zlib
 from random import Random
 from typing import List, Dict
 
 import LLA.chat_with_ai as ai
-from render.egg_generate import generateEgg
+from LLA.executor import requestExecutor
+from render.egg_jobs import EggJob, eggJobs
 from utils.util import utils
-from window.input import asyncTasks
 
+STYLE_KEYWORDS: dict[str, int] = {
+	'butterfly-bow': 1,
+	'C': 2,
+	'champion': 3,
+	'flowery': 4,
+	'hearty': 5,
+	'grassy': 6,
+	'music': 7,
+	'runic': 8,
+	'pythonic': 9,
+	'rabit': 10,
+	'second-best': 11,
+}
+"""
+蛋蛋工厂中固定词条对应的花纹，离线时使用
+"""
+_colorPattern = re.compile(r'#([0-9a-fA-F]{6})')
 
-def asyncEgg(keywords: list[str], random: Random):
-	asyncTasks.create_task(getProperties(keywords, random))
 
+def asyncEgg(keywords: list[str], random: Random) -> EggJob:
+	"""
+	让AI决定花纹，然后在后台合成蛋
+	:return: 任务句柄。取消句柄会同时取消对AI的询问
+	"""
+	job = eggJobs.create(random)
+	job.addCancelCallback(ai.runAsync(getProperties(keywords, job)).cancel)
+	return job
 
-async def getProperties(keywords: List[str], random: Random):
+
+async def getProperties(keywords: List[str], job: EggJob):
+	try:
+		properties = await requestExecutor.run("蛋的花纹", _message(keywords), parseProperties, lambda: offlineProperties(keywords))
+	except Exception as e:
+		job.fail(e)
+		return
+	utils.info(properties)
+	eggJobs.compose(job, *properties)
+
+
+def _message(keywords: List[str]) -> List[Dict]:
 	msg = [
 		{
 			"role": "user",
@@ -27,50 +63,38 @@ async def getProperties(keywords: List[str], random: Random):
 				f"And finally, reply me the color you think is proper for the egg itself, in the form of #RRGGBB, in the third line."
 		}
 	]
-	new = None
-	new2 = None
-	egg = None
-	while True:
-		response = ai.client.chat.completions.create(
-			model="llama3.2",
-			messages=msg  # a list of dictionary contains all chat dictionary
-		)
-		content = response.choices[0].message.content
-		lst = content.split('\n')
-		if len(lst) < 3:
-			continue
-		lst, clr, egg = lst[0].split(' '), lst[1].split(' '), lst[2].strip()
-		try:
-			egg = int(egg[1:], 16)
-		except Exception as e:
-			utils.printException(e)
-			continue
-		new = []
-		new2 = []
-		for i in lst:
-			try:
-				j = i.strip()
-				if len(j) == 0:
-					continue
-				j = int(j)
-				new.append(j)
-				assert 0 < j < 12
-			except Exception as e:
-				utils.printException(e)
-				break
-		else:
-			for i in clr:
-				try:
-					j = i.strip()
-					if len(j) < 2:
-						continue
-					new2.append(int(j[1:], 16))
-				except Exception as e:
-					utils.printException(e)
-					break
-			else:
-				if len(new) == len(new2):
-					break
-	properties = new, new2, egg
-	utils.info(properties)
-	generateEgg(new, new2, egg, random)
+	return msg
+
+
+def parseProperties(content: str) -> tuple[list[int], list[int], int]:
+	"""
+	解析AI的回复：第一行花纹编号，第二行对应的花纹颜色，第三行蛋壳颜色
+	:return: (style, colors, egg)，含义同egg_generate.composeEgg
+	:raise ValueError: 回复不合格
+	"""
+	lines = [line for line in content.split('\n') if len(line.strip()) != 0]
+	if len(lines) < 3:
+		raise ValueError(f"需要3行，只有{len(lines)}行")
+	style = [int(i) for i in re.findall(r'\d+', lines[0])]
+	if len(style) == 0 or not all(0 < i < 12 for i in style):
+		raise ValueError(f"花纹编号不合法：{lines[0]}")
+	colors = [int(c, 16) for c in _colorPattern.findall(lines[1])]
+	if len(colors) != len(style):
+		raise ValueError(f"{len(style)}个花纹对应{len(colors)}个颜色")
+	egg = _colorPattern.search(lines[2])
+	if egg is None:
+		raise ValueError(f"蛋壳颜色不合法：{lines[2]}")
+	return style, colors, int(egg.group(1), 16)
+
+
+def offlineProperties(keywords: List[str]) -> tuple[list[int], list[int], int]:
+	"""
+	不询问AI，由词条决定花纹。相同的词条总是得到相同的蛋
+	"""
+	random = Random(zlib.crc32('\0'.join(keywords).encode()))
+	style = list(dict.fromkeys(STYLE_KEYWORDS[k] for k in keywords if k in STYLE_KEYWORDS))
+	if len(style) == 0:
+		style = random.sample(range(1, 12), random.randint(1, 3))
+	colors = [random.randint(0, 0xffffff) for _ in style]
+	egg = (random.randint(0x99, 0xff) << 16) | (random.randint(0x99, 0xff) << 8) | random.randint(0x99, 0xff)  # 蛋壳用浅色
+	return style, colors, egg
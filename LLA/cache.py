@@ -0,0 +1,121 @@
+"""
+AI回复的磁盘缓存。以模型名和规范化后的消息列表的哈希为键，保存在user/ai_cache中，
+重复启动游戏、重复用相同的词条生蛋时不需要再访问网络。
+"""
+import hashlib
+import json
+import os
+import time
+from threading import Lock, get_ident
+from typing import Dict, List
+
+from save import configs
+from utils.util import utils
+
+
+class ResponseCache:
+	"""
+	每个回复一个文件。过期的条目在读取时删除；总大小超过上限时从最久没有写入的开始删除
+	读写磁盘较慢，不要在asyncTasks的循环中直接调用，用asyncio.to_thread交给其他线程。可以同时在多个线程中使用
+	"""
+	
+	def __init__(self, directory: str = "user/ai_cache"):
+		self.directory: str = directory
+		self.ttl: float = 7 * 86400
+		"""
+		条目的有效期（秒）
+		"""
+		self.maxSize: int = 4 << 20
+		"""
+		缓存总大小上限（字节），0为关闭缓存
+		"""
+		self.hits: int = 0
+		self.misses: int = 0
+		self._lock: Lock = Lock()  # 保护计数和清理
+	
+	@staticmethod
+	def key(model: str, msg: List[Dict]) -> str:
+		canonical = json.dumps([model, msg], ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+		return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+	
+	def _path(self, key: str) -> str:
+		return os.path.join(self.directory, key + ".json")
+	
+	def get(self, model: str, msg: List[Dict]) -> str | None:
+		"""
+		:return: 缓存的回复内容，没有或已过期时返回None
+		"""
+		if self.maxSize == 0:
+			return None
+		path = self._path(self.key(model, msg))
+		try:
+			with open(path, "r", encoding="utf-8") as f:
+				entry = json.load(f)
+			if time.time() - entry["time"] > self.ttl:
+				os.remove(path)
+			else:
+				with self._lock:
+					self.hits += 1
+				return entry["content"]
+		except FileNotFoundError:
+			pass
+		except Exception as e:  # 文件损坏等，当作没有缓存
+			utils.printException(e)
+		with self._lock:
+			self.misses += 1
+		return None
+	
+	def put(self, model: str, msg: List[Dict], content: str) -> None:
+		if self.maxSize == 0:
+			return
+		try:
+			os.makedirs(self.directory, exist_ok=True)
+			path = self._path(self.key(model, msg))
+			temp = f"{path}.{get_ident()}.tmp"  # 多个线程可能同时写同一条
+			with open(temp, "w", encoding="utf-8") as f:
+				json.dump({"time": time.time(), "model": model, "content": content}, f, ensure_ascii=False)
+			os.replace(temp, path)
+			self._evict()
+		except Exception as e:
+			utils.printException(e)
+	
+	def _evict(self) -> None:
+		entries = []
+		total = 0
+		with self._lock, os.scandir(self.directory) as it:
+			for entry in it:
+				if entry.is_file() and entry.name.endswith(".json"):
+					stat = entry.stat()
+					entries.append((stat.st_mtime, stat.st_size, entry.path))
+					total += stat.st_size
+			if total <= self.maxSize:
+				return
+			entries.sort()
+			for _, size, path in entries:
+				try:
+					os.remove(path)
+				except FileNotFoundError:  # 刚被其他线程当作过期条目删除
+					pass
+				total -= size
+				if total <= self.maxSize:
+					break
+	
+	def clear(self) -> None:
+		if not os.path.exists(self.directory):
+			return
+		for name in os.listdir(self.directory):
+			if name.endswith(".json"):
+				os.remove(os.path.join(self.directory, name))
+	
+	def readConfig(self, config: dict[str, any]) -> None:
+		self.ttl = configs.readElseDefault(config, "aiCacheDays", 7, lambda f: utils.frange(f, 0, 3650)) * 86400
+		self.maxSize = int(configs.readElseDefault(config, "aiCacheSize", 4, lambda f: utils.frange(f, 0, 1024)) * (1 << 20))
+	
+	def writeConfig(self) -> dict[str, any]:
+		return {
+			"aiCacheDays": self.ttl / 86400,
+			"aiCacheSize": self.maxSize / (1 << 20),
+		}
+
+
+responseCache: ResponseCache = ResponseCache()
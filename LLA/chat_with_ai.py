@@ -1,12 +1,108 @@
-from openai import OpenAI
-from typing import List, Dict
+import asyncio
+import re
+import time
+from concurrent.futures import Future
+from enum import Enum
+from typing import List, Dict, Coroutine, AsyncIterator, TYPE_CHECKING, Union
 
+from LLA.history import ChatHistory
+from save import configs
 from utils.util import utils
 
-client = OpenAI(
-	base_url='http://10.15.88.73:5034/v1',
-	api_key='ollama',  # required but ignored
-)
+if TYPE_CHECKING:
+	from openai import AsyncOpenAI
+
+MODEL: str = "llama3.2"
+REQUEST_TIMEOUT: float = 60
+"""
+单次请求的超时（秒）
+"""
+baseUrl: str = 'http://10.15.88.73:5034/v1'
+"""
+OpenAI兼容接口的地址。可以在设置中改为本地的测试服务器
+"""
+
+
+class AiState(Enum):
+	IDLE = 0  # 还没有用到AI
+	STARTING = 1  # 正在后台导入openai、创建客户端
+	READY = 2
+	FAILED = 3  # 无法启动（例如没有安装openai），只能使用离线结果
+
+
+state: AiState = AiState.IDLE
+startupTime: float = 0
+"""
+启动用时（秒）
+"""
+client: Union['AsyncOpenAI', None] = None
+"""
+异步客户端，只在asyncTasks的循环中使用。所有请求共用同一个连接池。第一次用到AI时才创建
+"""
+_starting: Union['asyncio.Task', None] = None
+"""
+启动任务，由asyncTasks的循环持有，只在该循环中读写。等待它的一方被取消不会取消它
+"""
+
+
+def _newClient() -> 'AsyncOpenAI':
+	from openai import AsyncOpenAI  # 导入openai很慢，不在游戏启动时进行
+	return AsyncOpenAI(
+		base_url=baseUrl,
+		api_key='ollama',  # required but ignored
+		timeout=REQUEST_TIMEOUT,
+		max_retries=0,
+	)
+
+
+def warmUp() -> Future:
+	"""
+	在后台启动AI，然后准备形容词。第一次按Enter、打开蛋蛋工厂时调用；重复调用只会启动一次
+	:return: 客户端创建完成（或失败）时结束。取消它不会中断启动
+	"""
+	return runAsync(_ensureStarted())
+
+
+async def _ensureStarted() -> None:
+	"""
+	需要时开始启动，并等待启动结束。启动失败后再次调用会重新尝试
+	"""
+	global state, _starting
+	if _starting is None:
+		state = AiState.STARTING
+		_starting = asyncio.get_running_loop().create_task(_start())
+	await asyncio.shield(_starting)  # 调用者被取消（例如按ESC）时只放弃等待
+
+
+async def _start() -> None:
+	global state, startupTime, client, _starting
+	start = time.perf_counter()
+	try:
+		client = await asyncio.get_running_loop().run_in_executor(None, _newClient)
+	except asyncio.CancelledError:  # 循环关闭
+		state = AiState.IDLE
+		_starting = None
+		raise
+	except Exception as e:
+		utils.printException(e)
+		state = AiState.FAILED
+		_starting = None
+		return
+	startupTime = time.perf_counter() - start
+	state = AiState.READY
+	utils.info(f"AI启动完成，用时{startupTime * 1000:.0f}ms")
+	asyncio.get_running_loop().create_task(getWords())  # 不让第一个问题等形容词
+
+
+async def _getClient() -> 'AsyncOpenAI':
+	"""
+	:raise RuntimeError: AI无法启动
+	"""
+	if client is None:
+		await _ensureStarted()
+	if client is None:
+		raise RuntimeError("AI不可用")
+	return client
 
 messages: List[Dict] = [
 	{
@@ -70,6 +166,11 @@ messages: List[Dict] = [
 	}
 ]
 
+history: ChatHistory = ChatHistory(messages)
+"""
+与玩家的对话历史。messages只有系统提示，对话记录在这里
+"""
+
 system: List[Dict] = [
 	{
 		"role": "user",
@@ -79,63 +180,163 @@ system: List[Dict] = [
 ]
 
 
-words = []
+OFFLINE_WORDS: list[str] = [
+	'shiny', 'mysterious', 'ancient', 'cozy', 'brave', 'sleepy', 'magical', 'cheerful', 'lucky', 'fragile',
+	'royal', 'sparkling', 'gentle', 'wild', 'dreamy', 'legendary', 'curious', 'humble', 'cosmic', 'elegant',
+]
+"""
+连不上AI时使用的形容词
+"""
+
+
+words: list[str] = list(OFFLINE_WORDS)
+"""
+蛋蛋工厂里的形容词。AI启动后替换为AI给出的
+"""
 
 
-def asyncWords():
+def runAsync(coroutine: Coroutine) -> Future:
+	"""
+	在asyncTasks的循环中运行协程。可以在任何线程中调用
+	:return: 可以在任何线程中查询和取消
+	"""
 	from window.input import asyncTasks
-	asyncTasks.create_task(getWords())
-
-
-async def getWords():
-	lst = []
-	while len(lst) < 10 or len(lst[0]) > 25:
-		response = client.chat.completions.create(
-			model="llama3.2",
-			messages=system,  # a list of dictionary contains all chat dictionary
-		)
-		content = response.choices[0].message.content
-		lst = content.split('\n')
-		utils.info(lst)
+	return asyncio.run_coroutine_threadsafe(coroutine, asyncTasks)
+
+
+async def complete(msg: List[Dict], timeout: float = REQUEST_TIMEOUT) -> Dict:
+	"""
+	询问模型，等待回复期间不阻塞其他异步任务
+	:param msg: 完整的消息列表
+	:param timeout: 超时（秒），超时抛出openai.APITimeoutError
+	:return: {"role": ..., "content": ...}
+	"""
+	response = await (await _getClient()).chat.completions.create(
+		model=MODEL,
+		messages=msg,  # a list of dictionary contains all chat dictionary
+		timeout=timeout,
+	)
+	message = response.choices[0].message
+	return {"role": message.role, "content": message.content or ''}
+
+
+async def stream(msg: List[Dict], timeout: float = REQUEST_TIMEOUT) -> AsyncIterator[str]:
+	"""
+	流式询问模型，收到一段就返回一段
+	:param msg: 完整的消息列表
+	:param timeout: 每次等待数据的超时（秒）
+	"""
+	response = await (await _getClient()).chat.completions.create(
+		model=MODEL,
+		messages=msg,
+		timeout=timeout,
+		stream=True,
+	)
+	try:
+		async for chunk in response:
+			if len(chunk.choices) == 0:
+				continue
+			piece = chunk.choices[0].delta.content
+			if piece:
+				yield piece
+	finally:
+		await response.close()
+
+
+def asyncWords() -> Future:
+	"""
+	重新向AI要一批形容词，供下次打开蛋蛋工厂时使用。不使用缓存，保证每次都是新的一批
+	"""
+	if state == AiState.IDLE or state == AiState.STARTING:
+		return warmUp()  # 启动后会准备形容词，不重复请求
+	return runAsync(getWords(False))
+
+
+def parseWords(content: str) -> list[str]:
+	"""
+	解析形容词列表。容忍编号、项目符号和逗号分隔，跳过以冒号结尾的开场白
+	:raise ValueError: 回复不合格
+	"""
 	new = []
-	for i in lst:
-		i = i.strip().lower()
-		if len(i) == 0:
+	for i in content.replace(',', '\n').split('\n'):
+		i = re.sub(r'^\s*(\d+[.)、]|[-*•])?\s*', '', i).strip().lower()
+		if len(i) == 0 or i.endswith(':'):
 			continue
+		if len(i) > 25:
+			raise ValueError(f"不是一个词：{i}")
 		new.append(i)
+	if len(new) < 10:
+		raise ValueError(f"只有{len(new)}个词")
+	return new
+
+
+async def getWords(cache: bool = True):
+	from LLA.executor import requestExecutor
 	global words
-	words = new
+	words = await requestExecutor.run("形容词", system, parseWords, lambda: list(OFFLINE_WORDS), cache=cache)
+	utils.info(words)
 
 
 async def send(msg: str):
-	messages.append({"role": "user", "content": msg})
-	response = client.chat.completions.create(
-		model="llama3.2",
-		messages=messages,  # a list of dictionary contains all chat dictionary
-	)
-	messages.append({"role": response.choices[0].message.role, "content": response.choices[0].message.content})
-	return messages[-1]
+	"""
+	提问。取消或失败时不会在历史中留下没有回答的问题
+	"""
+	question = {"role": "user", "content": msg}
+	reply = await complete(history.build(question))
+	history.append(question, reply)
+	return reply
 
 
-if __name__ == '__main__':
+async def sendStream(msg: str) -> AsyncIterator[str]:
+	"""
+	提问，逐段返回回复。回复完整收到后才记入历史
+	"""
+	question = {"role": "user", "content": msg}
+	parts: list[str] = []
+	async for piece in stream(history.build(question)):
+		parts.append(piece)
+		yield piece
+	history.append(question, {"role": "assistant", "content": ''.join(parts)})
+
+
+def readConfig(config: dict[str, any]) -> None:
+	global baseUrl, client
+	url = configs.readElseDefault(config, "aiBaseUrl", baseUrl, lambda u: str(u))
+	if url != baseUrl:
+		baseUrl = url
+		if client is not None:
+			client = _newClient()
+	history.readConfig(config)
+
+
+def writeConfig() -> dict[str, any]:
+	ret = {
+		"aiBaseUrl": baseUrl,
+	}
+	ret.update(history.writeConfig())
+	return ret
+
+
+async def _repl() -> None:
+	"""
+	命令行对话。客户端的连接池属于创建它的事件循环，所以整个对话在同一个循环中进行
+	"""
+	global client, state
+	client = _newClient()
+	state = AiState.READY
+	loop = asyncio.get_running_loop()
 	print("SYSTEM :  What can I help for you?")
 	while True:
-		user_input = input("User: ")
+		user_input = await loop.run_in_executor(None, input, "User: ")
 		if user_input.lower() in ["exit", "quit"]:
 			print("chat ends.")
 			break
-		
-		messages.append({"role": "user", "content": user_input})
-		
-		response = client.chat.completions.create(
-			model="llama3.2",
-			messages=messages,  # a list of dictionary contains all chat dictionary
-		)
-		
-		# 提取模型回复
-		utils.info(response.choices[0].message)
-		assistant_reply = response.choices[0].message.content
-		print(f"SYSTEM: {assistant_reply}")
-		
-		# 将助手回复添加到对话历史
-		messages.append({"role": "assistant", "content": assistant_reply})
+		print("SYSTEM: ", end='', flush=True)
+		async for piece in sendStream(user_input):
+			print(piece, end='', flush=True)
+		print()
+	await client.close()
+
+
+if __name__ == '__main__':
+	asyncio.run(_repl())
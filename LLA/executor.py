@@ -0,0 +1,103 @@
+"""
+AI请求执行器。所有需要解析回复的请求都从这里发出：失败或回复不合格时有限次重试，
+重试之间指数退避并加随机抖动，次数用完后使用离线的兜底结果，不会无限占用服务器和线程。
+"""
+import asyncio
+import random
+import time
+from typing import Callable, Dict, List, TypeVar
+
+import LLA.chat_with_ai as ai
+from LLA.cache import responseCache
+from utils.util import utils
+
+T = TypeVar('T')
+
+
+class RequestExecutor:
+	def __init__(self):
+		self.maxAttempts: int = 4
+		"""
+		每个请求最多询问几次
+		"""
+		self.baseDelay: float = 0.5
+		"""
+		第一次重试前等待的时间（秒），之后每次翻倍
+		"""
+		self.maxDelay: float = 8
+		"""
+		重试等待时间的上限（秒）
+		"""
+		self.requests: int = 0
+		self.retries: int = 0
+		self.fallbacks: int = 0
+		self.lastLatency: float = 0
+		"""
+		最近一次请求的耗时（秒）
+		"""
+		self.averageLatency: float = 0
+		"""
+		请求耗时的滑动平均（秒）
+		"""
+	
+	def delay(self, attempt: int) -> float:
+		"""
+		:param attempt: 已经失败的次数，从1开始
+		:return: 下一次询问前等待的时间（秒）。在上限以内的指数退避上取随机值，避免多个请求同时重试
+		"""
+		return random.uniform(0.5, 1) * min(self.maxDelay, self.baseDelay * (2 ** (attempt - 1)))
+	
+	def _record(self, start: float) -> None:
+		latency = time.perf_counter() - start
+		self.lastLatency = latency
+		self.averageLatency = latency if self.requests == 1 else self.averageLatency * 0.8 + latency * 0.2
+	
+	async def run(self, name: str, msg: List[Dict], parse: Callable[[str], T], fallback: Callable[[], T], timeout: float = ai.REQUEST_TIMEOUT, cache: bool = True) -> T:
+		"""
+		询问模型并解析回复
+		:param name: 用于日志
+		:param msg: 完整的消息列表
+		:param parse: 解析回复内容。回复不合格时抛出ValueError
+		:param fallback: 所有尝试都失败时提供结果，不访问网络
+		:param timeout: 每次询问的超时（秒）
+		:param cache: 是否使用磁盘缓存。只有解析成功的回复才会被缓存
+		"""
+		if cache:
+			content = await asyncio.to_thread(responseCache.get, ai.MODEL, msg)  # 读写磁盘不占用事件循环
+			if content is not None:
+				try:
+					return parse(content)
+				except ValueError as e:  # 解析规则变了，旧缓存不再合格
+					utils.warn(f"{name}的缓存不合格：{e}")
+		for attempt in range(1, self.maxAttempts + 1):
+			if ai.state == ai.AiState.FAILED:
+				break
+			if attempt > 1:
+				self.retries += 1
+				await asyncio.sleep(self.delay(attempt - 1))
+			self.requests += 1
+			start = time.perf_counter()
+			try:
+				content = (await ai.complete(msg, timeout))['content']
+			except Exception as e:  # 取消（CancelledError）直接向外抛出
+				self._record(start)
+				utils.warn(f"{name}第{attempt}次请求失败：{e}")
+				continue
+			self._record(start)
+			try:
+				result = parse(content)
+			except ValueError as e:
+				utils.warn(f"{name}第{attempt}次回复不合格：{e}")
+				continue
+			if cache:
+				await asyncio.to_thread(responseCache.put, ai.MODEL, msg, content)
+			return result
+		self.fallbacks += 1
+		utils.warn(f"{name}没有得到合格的回复，使用离线结果")
+		return fallback()
+	
+	def describe(self) -> str:
+		return f"ai {ai.state.name.lower()} {self.requests} req +{self.retries} -{self.fallbacks} {self.lastLatency * 1000:.0f}/{self.averageLatency * 1000:.0f}ms cache {responseCache.hits}/{responseCache.misses}"
+
+
+requestExecutor: RequestExecutor = RequestExecutor()
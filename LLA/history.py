@@ -0,0 +1,96 @@
+"""
+AI对话历史。每次提问只带上系统提示和预算以内的最近几轮对话，更早的对话不再发送，
+玩得再久每次提问的长度也基本不变。历史在退出时保存，下次启动时恢复。
+"""
+import json
+import os
+from typing import Callable, Dict, List
+
+from save import configs
+from utils.util import utils
+
+
+def estimateTokens(text: str) -> int:
+	"""
+	粗略估计token数。英文大约4个字节一个token，中文一个字3个字节，大约一个token，都按4字节估计
+	"""
+	return (len(text.encode('utf-8')) + 3) >> 2
+
+
+class ChatHistory:
+	def __init__(self, system: List[Dict], path: str = "user/ai_history.json"):
+		self.system: List[Dict] = system
+		"""
+		系统提示，每次都发送，不计入预算
+		"""
+		self.path: str = path
+		self.budget: int = 1024
+		"""
+		每次发送的历史对话的token预算，不包括系统提示和本次提问
+		"""
+		self.maxTurns: int = 64
+		"""
+		最多保存的轮数，超出的最早的对话被丢弃
+		"""
+		self.tokenizer: Callable[[str], int] = estimateTokens
+		"""
+		估计一段文字的token数。可以替换为模型对应的分词器
+		"""
+		self._turns: list[tuple[Dict, Dict, int]] = []  # (提问, 回答, token数)
+	
+	def setTokenizer(self, tokenizer: Callable[[str], int]) -> None:
+		self.tokenizer = tokenizer
+		self._turns = [(q, a, tokenizer(q["content"]) + tokenizer(a["content"])) for q, a, _ in self._turns]
+	
+	def build(self, question: Dict) -> List[Dict]:
+		"""
+		:return: 本次要发送的消息列表：系统提示、预算以内的最近几轮对话、本次提问
+		"""
+		recent: List[Dict] = []
+		used = 0
+		for q, a, tokens in reversed(self._turns):
+			used += tokens
+			if used > self.budget:
+				break
+			recent.append(a)
+			recent.append(q)
+		recent.reverse()
+		return self.system + recent + [question]
+	
+	def append(self, question: Dict, reply: Dict) -> None:
+		self._turns.append((question, reply, self.tokenizer(question["content"]) + self.tokenizer(reply["content"])))
+		if len(self._turns) > self.maxTurns:
+			del self._turns[:len(self._turns) - self.maxTurns]
+	
+	def turns(self) -> list[tuple[Dict, Dict]]:
+		return [(q, a) for q, a, _ in self._turns]
+	
+	def clear(self) -> None:
+		self._turns.clear()
+	
+	def load(self) -> None:
+		if not os.path.exists(self.path):
+			return
+		try:
+			with open(self.path, "r", encoding="utf-8") as f:
+				turns = json.load(f)
+			self._turns.clear()
+			for q, a in turns:
+				self.append({"role": "user", "content": str(q)}, {"role": "assistant", "content": str(a)})
+		except Exception as e:
+			utils.printException(e)
+	
+	def save(self) -> None:
+		try:
+			with open(self.path, "w", encoding="utf-8") as f:
+				json.dump([[q["content"], a["content"]] for q, a, _ in self._turns], f, ensure_ascii=False)
+		except Exception as e:
+			utils.printException(e)
+	
+	def readConfig(self, config: dict[str, any]) -> None:
+		self.budget = int(configs.readElseDefault(config, "aiHistoryBudget", 1024, lambda i: utils.frange(i, 0, 32768)))
+	
+	def writeConfig(self) -> dict[str, any]:
+		return {
+			"aiHistoryBudget": self.budget,
+		}
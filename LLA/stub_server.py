@@ -0,0 +1,155 @@
+"""
+本地的OpenAI兼容测试服务器，只用标准库。不需要真正的模型就可以测试流式回复、重试和缓存：
+	python -m LLA.stub_server 5034        # 启动服务器，然后在user/config.json中把aiBaseUrl设为http://127.0.0.1:5034/v1
+	python -m LLA.stub_server --check     # 启动服务器并用chat_with_ai检查流式回复（需要安装openai）
+流式回复会被切成很小的片段，中间夹着choices为空的数据块；提问以"slow:"开头时每段之间等待，用于测试中途取消
+"""
+import asyncio
+import json
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+WORDS: list[str] = [
+	'shiny', 'mysterious', 'ancient', 'cozy', 'brave', 'sleepy', 'magical', 'cheerful', 'lucky', 'fragile',
+	'royal', 'sparkling', 'gentle', 'wild', 'dreamy', 'legendary', 'curious', 'humble', 'cosmic', 'elegant',
+]
+PIECE: int = 3
+"""
+流式回复每段的字数
+"""
+SLOW_DELAY: float = 0.2
+"""
+以"slow:"开头的提问，每段之间等待的时间（秒）
+"""
+
+
+def reply(messages: list[dict]) -> str:
+	"""
+	按提问的内容给出格式合格的回复：形容词列表、蛋的花纹，或者原样复述
+	"""
+	question = messages[-1]["content"] if len(messages) > 0 else ''
+	if "adjective" in question:
+		return '\n'.join(WORDS)
+	if "serial number" in question:
+		return "1 4\n#ff8800 #33aa33\n#fff4e0"
+	return f"Stub reply to: {question} " + "la " * (20 if question.startswith("slow:") else 2)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+	protocol_version = "HTTP/1.1"
+	
+	def log_message(self, format, *args) -> None:
+		pass
+	
+	def do_POST(self) -> None:
+		if not self.path.endswith("/chat/completions"):
+			self.send_error(404)
+			return
+		body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+		content = reply(body.get("messages", []))
+		model = body.get("model", "stub")
+		if body.get("stream"):
+			self._stream(content, model, SLOW_DELAY if content.startswith("Stub reply to: slow:") else 0)
+			return
+		data = json.dumps({
+			"id": "stub", "object": "chat.completion", "created": int(time.time()), "model": model,
+			"choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+		}).encode()
+		self.send_response(200)
+		self.send_header("Content-Type", "application/json")
+		self.send_header("Content-Length", str(len(data)))
+		self.end_headers()
+		self.wfile.write(data)
+	
+	def _stream(self, content: str, model: str, delay: float) -> None:
+		self.send_response(200)
+		self.send_header("Content-Type", "text/event-stream")
+		self.send_header("Connection", "close")
+		self.end_headers()
+		
+		def chunk(choices: list[dict]) -> None:
+			data = {"id": "stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": model, "choices": choices}
+			self.wfile.write(f"data: {json.dumps(data)}\n\n".encode())
+			self.wfile.flush()
+		
+		try:
+			chunk([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+			for i in range(0, len(content), PIECE):
+				if i % (PIECE * 4) == PIECE:
+					chunk([])  # 有的服务器会发送没有choices的数据块，例如用量统计
+				chunk([{"index": 0, "delta": {"content": content[i:i + PIECE]}, "finish_reason": None}])
+				if delay > 0:
+					time.sleep(delay)
+			chunk([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+			self.wfile.write(b"data: [DONE]\n\n")
+			self.wfile.flush()
+		except (BrokenPipeError, ConnectionResetError):  # 客户端中途取消
+			pass
+		self.close_connection = True
+
+
+def serve(port: int = 0) -> ThreadingHTTPServer:
+	"""
+	在后台线程中启动服务器
+	:param port: 0为任选一个空闲端口
+	"""
+	server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+	Thread(target=server.serve_forever, name="StubServer", daemon=True).start()
+	return server
+
+
+async def check(port: int) -> None:
+	"""
+	通过chat_with_ai的stream和sendStream检查：片段完整拼接、跳过空的choices、中途取消不留下半截历史
+	"""
+	import LLA.chat_with_ai as ai
+	ai.baseUrl = f"http://127.0.0.1:{port}/v1"
+	ai.client = ai._newClient()
+	ai.state = ai.AiState.READY
+	question = [{"role": "user", "content": "hello"}]
+	pieces = [p async for p in ai.stream(question)]
+	assert len(pieces) > 1, pieces
+	assert ''.join(pieces) == reply(question), pieces
+	
+	ai.history.clear()
+	text = ''.join([p async for p in ai.sendStream("hello")])
+	assert ai.history.turns() == [({"role": "user", "content": "hello"}, {"role": "assistant", "content": text})], ai.history.turns()
+	
+	received: list[str] = []
+	
+	async def consume():
+		async for p in ai.sendStream("slow: please"):
+			received.append(p)
+	
+	task = asyncio.create_task(consume())
+	while len(received) < 2:
+		await asyncio.sleep(0.01)
+	task.cancel()
+	try:
+		await task
+		raise AssertionError("没有被取消")
+	except asyncio.CancelledError:
+		pass
+	assert len(ai.history.turns()) == 1, "取消的提问不应留在历史中"
+	
+	words = await ai.complete(ai.system)
+	assert ai.parseWords(words["content"]) == WORDS
+	await ai.client.close()
+	print("stub server check passed")
+
+
+if __name__ == '__main__':
+	if "--check" in sys.argv:
+		stub = serve()
+		asyncio.run(check(stub.server_address[1]))
+		stub.shutdown()
+	else:
+		stub = serve(int(sys.argv[1]) if len(sys.argv) > 1 else 5034)
+		print(f"stub server listening on http://127.0.0.1:{stub.server_address[1]}/v1")
+		try:
+			while True:
+				time.sleep(3600)
+		except KeyboardInterrupt:
+			stub.shutdown()
@@ -9,22 +9,37 @@ from utils.error import InvalidOperationException, neverCall
 from utils.text import RenderableString, BlockDescription, Description
 from utils.vector import Vector, BlockVector
 from music.music import Music_player
+from world.scheduler import tickScheduler
 
 if TYPE_CHECKING:
 	from entity.entity import Entity
 	from render.resource import Texture
+	from world.chunk import Chunk
 
 
 class Block(Element):
+	ticking: bool = False
+	"""
+	为True时每tick调用tick。随机事件请用randomTick，不需要设置这个
+	"""
+	
 	def __init__(self, blockID: str, name: str, description: 'BlockDescription', position: 'BlockVector', texture: 'Texture'):
 		super().__init__(name, description, texture)
 		self._position: 'BlockVector' = position.clone()
 		self._blockID: str = blockID
 		self._holding: list[Element] = []
+		self._chunk: Union['Chunk', None] = None  # 所属区块，由Chunk.set设置
 	
 	def tick(self) -> None:
 		pass
 	
+	def randomTick(self) -> None:
+		"""
+		可重写。随机刻，由世界随机抽中时调用，平均每tickScheduler.randomTickScale()个tick一次。
+		用于生成实体这类低频的随机事件，比每tick掷骰子开销小得多
+		"""
+		pass
+	
 	def passTick(self) -> None:
 		self.tick()
 		if len(self._holding) > 0:
@@ -33,10 +48,23 @@ class Block(Element):
 	
 	def render(self, delta: float) -> None:
 		self.getTexture().renderAsBlock(self._position)
+		self.renderHolding(delta)
+	
+	def renderHolding(self, delta: float) -> None:
+		"""
+		只渲染叠加的元素。地面缓存已经画好方块本身时由World.render调用
+		"""
 		if len(self._holding) > 0:
 			for h in self._holding:
 				h.passRender(delta)
 	
+	def _changed(self) -> None:
+		"""
+		外观改变后调用，使所属区块的地面缓存失效
+		"""
+		if self._chunk is not None:
+			self._chunk.version += 1
+	
 	def canPass(self, entity: Union['Entity', None] = None) -> bool:
 		"""
 		必须重写。标志当前挡块是否允许特定实体通过
@@ -70,6 +98,7 @@ class Block(Element):
 		if not self.tryHold(element):
 			raise InvalidOperationException("无法叠加元素")
 		self._holding.append(element)
+		self._changed()
 	
 	def getHolding(self) -> list[Element]:
 		"""
@@ -85,6 +114,7 @@ class Block(Element):
 		"""
 		if self._holding.__contains__(element):
 			self._holding.remove(element)
+			self._changed()
 			return True
 		else:
 			return False
@@ -157,11 +187,13 @@ class GrassBlock(Ground):
 	def __init__(self, position: 'BlockVector'):
 		super().__init__('nature.grass', "草地", BlockDescription(self, [RenderableString("\\#FF4BAB25青色的草地")]), position, resourceManager.getOrNew('block/grass'))
 	
-	def tick(self) -> None:
+	def randomTick(self) -> None:
 		if self.canPass():
-			rd = game.getWorld().getRandom()
-			if len(game.getWorld().getEntities()) <= 300 and rd.random() < 0.00001 * (300 - len(game.getWorld().getEntities())):
-				game.getWorld().addEntity(entityManager.get(rd.choice(['entity.stick', 'entity.rice']))(Vector(rd.random() + self._position.x, rd.random() + self._position.y)))
+			world = game.getWorld()
+			rd = world.getRandom()
+			count = world.getEntityCount()
+			if count <= 300 and rd.random() < 0.00001 * (300 - count) * tickScheduler.randomTickScale():
+				world.addEntity(entityManager.get(rd.choice(['entity.stick', 'entity.rice']))(Vector(rd.random() + self._position.x, rd.random() + self._position.y)))
 	
 	@classmethod
 	def load(cls, d: dict, block=None) -> 'GrassBlock':
@@ -244,6 +276,8 @@ gateBlockTimer: int = 60
 
 
 class GateBlock(Ground):
+	ticking: bool = True  # tick中为站在门上的玩家计时并传送。门上通常没有叠加的元素，不能靠_holding被调度
+	
 	def __init__(self, position: BlockVector):
 		class Des(BlockDescription):
 			def __init__(this, block):
@@ -292,15 +326,23 @@ class BrickGroundBlock(Ground):
 	def __init__(self, position: BlockVector):
 		super().__init__('struct.brick', "砖块", BlockDescription(self, [RenderableString("\\#FFBABABA砖块")]), position, resourceManager.getOrNew('block/brick'))
 	
-	def tick(self) -> None:
+	def randomTick(self) -> None:
 		if self.canPass():
-			rd = game.getWorld().getRandom()
-			if len(game.getWorld().getEntities()) > 300:
+			world = game.getWorld()
+			rd = world.getRandom()
+			count = world.getEntityCount()
+			if count > 300:
 				return
-			if rd.random() < 0.00001 * (300 - len(game.getWorld().getEntities())):
-				game.getWorld().addEntity(entityManager.get('enemy.dog')(Vector(rd.random() + self._position.x, rd.random() + self._position.y)))
-			if rd.random() < 0.0001 * (300 - len(game.getWorld().getEntities())):
-				game.getWorld().addEntity(entityManager.get('entity.rice')(Vector(rd.random() + self._position.x, rd.random() + self._position.y)))
+			scale = tickScheduler.randomTickScale()
+			if rd.random() < 0.00001 * (300 - count) * scale:
+				world.addEntity(entityManager.get('enemy.dog')(Vector(rd.random() + self._position.x, rd.random() + self._position.y)))
+				count += 1
+			expected = 0.0001 * (300 - count) * scale  # 原来每tick的概率乘以间隔，可能大于1
+			n = int(expected)
+			if rd.random() < expected - n:
+				n += 1
+			for _ in range(min(n, 300 - count)):
+				world.addEntity(entityManager.get('entity.rice')(Vector(rd.random() + self._position.x, rd.random() + self._position.y)))
 	
 	@classmethod
 	def load(cls, d: dict, block=None) -> 'BrickGroundBlock':
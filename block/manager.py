@@ -2,14 +2,26 @@
 class BlockManager:
 	def __init__(self):
 		self.dic = {}
-		
+		self.numeric: dict[str, int] = {}  # 方块ID -> 数字编号，0保留给空方块
+		self.numericNames: list[str | None] = [None]
+	
 	def register(self, blockID: str, block: type):
 		if blockID in self.dic:
 			raise ValueError(f"注册一个已存在的方块ID: {blockID}")
 		self.dic[blockID] = block
+		self.numeric[blockID] = len(self.numericNames)
+		self.numericNames.append(blockID)
 	
 	def get(self, blockID: str):
 		return self.dic[blockID]
 
+	def getNumericID(self, blockID: str) -> int:
+		"""
+		获取方块的数字编号，用于区块中紧凑存储方块类型
+		:param blockID: 方块ID
+		:return: 数字编号。未注册的方块返回0
+		"""
+		return self.numeric.get(blockID, 0)
+
 
 blockManager: BlockManager = BlockManager()
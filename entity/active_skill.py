@@ -140,10 +140,9 @@ class ActiveFlash(Active):
 		if isRenderIcon:
 			ret = super().render(delta, at)
 			if self.coolDown > 0:
-				s = Surface(self.texture.getUiScaledSurface().get_size())
-				s.set_alpha(0xaa)
-				renderer.getCanvas().blit(s, at.getTuple())
-				renderer.renderString(RenderableString(f'\\11{int(self.coolDown / 20)}'), at.x + (s.get_width() >> 1), at.y + (s.get_height() >> 1), 0xffffffff, Location.CENTER)
+				w, h = self.texture.getUiScaledSurface().get_size()
+				renderer.fill(0xaa000000, at.x, at.y, w, h)
+				renderer.renderString(RenderableString(f'\\11{int(self.coolDown / 20)}'), at.x + (w >> 1), at.y + (h >> 1), 0xffffffff, Location.CENTER)
 			return ret
 		elif chosen:
 			renderSkill(3, 0.2, at - self.player.updatePosition(), 0x554499ee if self.coolDown <= 0 else 0x55ee4444, withLine=False)
@@ -203,10 +202,9 @@ class ActiveAdrenalin(Active):
 		if isRenderIcon:
 			ret = super().render(delta, at)
 			if self.coolDown > 0:
-				s = Surface(self.texture.getUiScaledSurface().get_size())
-				s.set_alpha(0xaa)
-				renderer.getCanvas().blit(s, at.getTuple())
-				renderer.renderString(RenderableString(f'\\11{int(self.coolDown / 20)}'), at.x + (s.get_width() >> 1), at.y + (s.get_height() >> 1), 0xffffffff, Location.CENTER)
+				w, h = self.texture.getUiScaledSurface().get_size()
+				renderer.fill(0xaa000000, at.x, at.y, w, h)
+				renderer.renderString(RenderableString(f'\\11{int(self.coolDown / 20)}'), at.x + (w >> 1), at.y + (h >> 1), 0xffffffff, Location.CENTER)
 			return ret
 		elif chosen:
 			renderSkillRange(2, 0x554499ee if self.coolDown <= 0 else 0x55ee4444, withLine=False)
@@ -266,7 +264,7 @@ class ActiveAttack(Active):
 		direction.normalize()
 		from entity.entity import Damageable
 		from entity.entity import Entity
-		for e in game.getWorld().getEntities():
+		for e in game.getWorld().queryRadius(pos, 2.7):  # 2.2再加上渲染位置与逻辑位置的误差
 			if not isinstance(e, Damageable):
 				continue
 			assert isinstance(e, Entity) and isinstance(e, Damageable)
@@ -323,10 +321,9 @@ class ActiveSwift(Active):
 		if isRenderIcon:
 			ret = super().render(delta, mouseAtMap)
 			if self.coolDown > 0:
-				s = Surface(self.texture.getUiScaledSurface().get_size())
-				s.set_alpha(0xaa)
-				renderer.getCanvas().blit(s, mouseAtMap.getTuple())
-				renderer.renderString(RenderableString(f'\\11{int(self.coolDown / 20)}'), mouseAtMap.x + (s.get_width() >> 1), mouseAtMap.y + (s.get_height() >> 1), 0xffffffff, Location.CENTER)
+				w, h = self.texture.getUiScaledSurface().get_size()
+				renderer.fill(0xaa000000, mouseAtMap.x, mouseAtMap.y, w, h)
+				renderer.renderString(RenderableString(f'\\11{int(self.coolDown / 20)}'), mouseAtMap.x + (w >> 1), mouseAtMap.y + (h >> 1), 0xffffffff, Location.CENTER)
 			return ret
 		elif chosen:
 			renderSkillRange(1.5, 0x550088cc if self.coolDown <= 0 else 0x550088cc, withLine=False)
@@ -362,7 +359,7 @@ class ActiveBreak(Active):
 			self.shouldResetMoveable = True
 			self.player.setPosition(self.__matchPosition())
 			from entity.enemy import Enemy
-			for e in game.getWorld().getEntities():
+			for e in game.getWorld().getEntities():  # 头槌命中全世界的敌人
 				if isinstance(e, Enemy):
 					e.damage(7 + self.player.growth_value * 0.01 * (self._level + 10), self.player)
 			self.player.growth_value *= 0.6
@@ -377,10 +374,9 @@ class ActiveBreak(Active):
 		if isRenderIcon:
 			ret = super().render(delta, mouseAtMap)
 			if self.coolDown > 0:
-				s = Surface(self.texture.getUiScaledSurface().get_size())
-				s.set_alpha(0xaa)
-				renderer.getCanvas().blit(s, mouseAtMap.getTuple())
-				renderer.renderString(RenderableString(f'\\11{int(self.coolDown / 20)}'), mouseAtMap.x + (s.get_width() >> 1), mouseAtMap.y + (s.get_height() >> 1), 0xffffffff, Location.CENTER)
+				w, h = self.texture.getUiScaledSurface().get_size()
+				renderer.fill(0xaa000000, mouseAtMap.x, mouseAtMap.y, w, h)
+				renderer.renderString(RenderableString(f'\\11{int(self.coolDown / 20)}'), mouseAtMap.x + (w >> 1), mouseAtMap.y + (h >> 1), 0xffffffff, Location.CENTER)
 			return ret
 		elif chosen:
 			renderSkillRange((3.5 + self._level * 0.2), 0x440088cc if self.coolDown <= 0 else 0x440088cc)
@@ -446,10 +442,9 @@ class ActiveRegeneration(Active):
 		if isRenderIcon:
 			ret = super().render(delta, mouseAtMap)
 			if self.coolDown > 0:
-				s = Surface(self.texture.getUiScaledSurface().get_size())
-				s.set_alpha(0xaa)
-				renderer.getCanvas().blit(s, mouseAtMap.getTuple())
-				renderer.renderString(RenderableString(f'\\11{int(self.coolDown / 20)}'), mouseAtMap.x + (s.get_width() >> 1), mouseAtMap.y + (s.get_height() >> 1), 0xffffffff, Location.CENTER)
+				w, h = self.texture.getUiScaledSurface().get_size()
+				renderer.fill(0xaa000000, mouseAtMap.x, mouseAtMap.y, w, h)
+				renderer.renderString(RenderableString(f'\\11{int(self.coolDown / 20)}'), mouseAtMap.x + (w >> 1), mouseAtMap.y + (h >> 1), 0xffffffff, Location.CENTER)
 			return ret
 		else:
 			if chosen:
@@ -24,6 +24,11 @@ from music.music import Music_player
 
 
 class Entity(Element):
+	ticking: bool = True
+	"""
+	为False时World.tick不会调用passTick，用于自身没有逻辑的实体
+	"""
+	
 	def __init__(self, entityID: str, name: str, description: EntityDescription, texture: list[Texture], position: Vector):
 		"""
 		:param name: 实体名称
@@ -50,11 +55,19 @@ class Entity(Element):
 		"""
 		pass
 	
+	def alwaysActive(self) -> bool:
+		"""
+		远离玩家时是否仍要每tick运行。默认远处的实体会降频或休眠
+		"""
+		return False
+	
 	def render(self, delta: float) -> None:
 		self._texture.renderAtMap(self._position)
 	
 	def setPosition(self, position: Vector) -> None:
 		self._position.set(position)
+		if (world := game.getWorld()) is not None:
+			world.updateEntity(self)
 	
 	def getPosition(self) -> Vector:
 		return self._position.clone()
@@ -313,6 +326,8 @@ class MoveableEntity(Entity):
 	
 	def passTick(self) -> None:
 		self._position.add(self.__velocity)
+		if self.__velocity.x != 0 or self.__velocity.y != 0:
+			game.getWorld().updateEntity(self)
 		self.lastDelta = 0
 		self.processMove()
 		if abs(self.__velocity.x) >= abs(self.__velocity.y):
@@ -437,16 +452,32 @@ class DeprecatedPlayer(MoveableEntity, Damageable):
 		return p
 
 
-class Rice(Entity):
+class Collectible(Entity):
+	"""
+	可拾取的实体。自身不参与tick，由World.processPickup按玩家位置统一结算
+	"""
+	ticking: bool = False
+	pickRange: float = 0.6
+	"""
+	拾取距离（曼哈顿距离）
+	"""
+	pickSound: int = 0
+	
+	def onPick(self, player: 'Player') -> None:
+		"""
+		被玩家拾取时调用，之后实体会被移出世界。交由具体类重写
+		"""
+		pass
+
+
+class Rice(Collectible):
+	pickSound: int = 0
+	
 	def __init__(self, position: Vector):
 		super().__init__('entity.rice', '米粒', EntityDescription(self, [RenderableString("\\#FFFFD700黄色的米粒")]), [resourceManager.getOrNew('entity/rice')], position)
 	
-	def tick(self) -> None:
-		player = game.getWorld().getPlayer()
-		if player is not None and player.getPosition().distanceManhattan(self.getPosition()) <= 0.6:
-			Music_player.sound_play(0)
-			player.grow(1, self)
-			game.getWorld().removeEntity(self)
+	def onPick(self, player: 'Player') -> None:
+		player.grow(1, self)
 	
 	@classmethod
 	def load(cls, d: dict, entity: Union['Entity', None] = None) -> Union['Entity', None]:
@@ -454,16 +485,14 @@ class Rice(Entity):
 		return Entity.load(d, e)
 
 
-class Stick(Entity):
+class Stick(Collectible):
+	pickSound: int = 1
+	
 	def __init__(self, position: Vector):
 		super().__init__('entity.stick', '树枝', EntityDescription(self, [RenderableString("\\#FFFFD700\\/坚硬的树枝"), RenderableString("\\#ffffd700用来搭窝")]), [resourceManager.getOrNew('entity/stick')], position)
 	
-	def tick(self) -> None:
-		player = game.getWorld().getPlayer()
-		if player is not None and player.getPosition().distanceManhattan(self.getPosition()) <= 0.6:
-			Music_player.sound_play(1)
-			player.pick(3, self)
-			game.getWorld().removeEntity(self)
+	def onPick(self, player: 'Player') -> None:
+		player.pick(3, self)
 	
 	@classmethod
 	def load(cls, d: dict, entity: Union['Entity', None] = None) -> Union['Entity', None]:
@@ -760,6 +789,8 @@ class Player(MoveableEntity, Damageable):
 
 
 class Coop(Entity):
+	ticking: bool = False
+	
 	def __init__(self, position: Vector):
 		super().__init__('entity.coop', '鸡窝', EntityDescription(self, [RenderableString('鸡舍')]), [resourceManager.getOrNew('entity/coop')], position)
 	
@@ -770,6 +801,8 @@ class Coop(Entity):
 
 
 class BlueEgg(Entity):
+	ticking: bool = False
+	
 	def __init__(self, position: Vector):
 		super().__init__('entity.egg.blue', '蓝色的蛋', EntityDescription(self, [RenderableString('\\#FF00D7FF蓝色的蛋'), RenderableString('\\#ff999999\\/    你别管为什么这么大')]), [a := resourceManager.getOrNew('egg/blue_egg'), a, a, a, a, a, a, a], position)
 	
@@ -780,6 +813,8 @@ class BlueEgg(Entity):
 
 
 class GoldEgg(Entity):
+	ticking: bool = False
+	
 	def __init__(self, position: Vector):
 		super().__init__('entity.egg.blue', '金色的蛋', EntityDescription(self, [RenderableString('\\#FFF2B912金色的蛋'), RenderableString('\\#ff999999\\/    你别管为什么这么大')]), [a := resourceManager.getOrNew('egg/gold_egg'), a, a, a, a, a, a, a], position)
 	
@@ -790,6 +825,8 @@ class GoldEgg(Entity):
 
 
 class RedEgg(Entity):
+	ticking: bool = False
+	
 	def __init__(self, position: Vector):
 		super().__init__('entity.egg.blue', '绯色的蛋', EntityDescription(self, [RenderableString('\\#FFB37153绯色的蛋'), RenderableString('\\#ff999999\\/    你别管为什么这么大')]), [a := resourceManager.getOrNew('egg/dark_red_egg'), a, a, a, a, a, a, a], position)
 	
@@ -872,6 +909,9 @@ class Rooster(MoveableEntity):
 		self._randomVelocity: Vector = Vector()
 		self.selected: bool = False
 	
+	def alwaysActive(self) -> bool:
+		return self.selected
+	
 	def tick(self) -> None:
 		if self.couple is not None and not self.couple._isAlive:
 			self.center = None
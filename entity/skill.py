@@ -1,7 +1,5 @@
 from typing import TYPE_CHECKING, Union
 
-from pygame import Surface
-
 from entity.manager import skillManager
 from render.renderer import renderer, Location
 from render.resource import resourceManager
@@ -200,10 +198,9 @@ class SkillRevive(Skill):
 	def render(self, delta: float, at: BlockVector, chosen: bool = None, isRenderIcon: bool = None) -> int:
 		ret = super().render(delta, at)
 		if self.coolDown > 0:
-			s = Surface(self.texture.getMapScaledSurface().get_size())
-			s.set_alpha(0xaa)
-			renderer.getCanvas().blit(s, at.getTuple())
-			renderer.renderString(RenderableString(f'\\11{int(self.coolDown / 20)}'), at.x + (s.get_width() >> 1), at.y + (s.get_height() >> 1), 0xffffffff, Location.CENTER)
+			w, h = self.texture.getMapScaledSurface().get_size()
+			renderer.fill(0xaa000000, at.x, at.y, w, h)
+			renderer.renderString(RenderableString(f'\\11{int(self.coolDown / 20)}'), at.x + (w >> 1), at.y + (h >> 1), 0xffffffff, Location.CENTER)
 		return ret
 	
 	def getName(self=None) -> RenderableString:
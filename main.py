@@ -1,29 +1,34 @@
+from utils.startup import startupProfiler  # 必须最先导入，才能记录其他模块的导入耗时
 import asyncio
 import time
 
 import pygame
 from threading import Thread
 
+from LLA import chat_with_ai as ai
+from LLA.cache import responseCache
+from LLA.executor import requestExecutor
 from interact.interacts import interact
 from music.music import Music_player
 from render import font
 
+from render.egg_jobs import eggJobs
 from render.renderer import renderer
-from render.resource import resourceManager
+from render.resource import resourceManager, scaledCache
 from save import configs
+from utils.clock import tickClock
 from utils.util import utils
 from utils.game import game
 from window.hud import Hud
 from window.input import InputWindow, asyncTasks
 from window.window import FloatWindow, StartWindow
+from world.scheduler import tickScheduler
 
 # 这句是必要的，会将entity/enemy.py中的实体类型注册到entityManager上
 from entity import enemy
 
 nowRender = time.perf_counter_ns()
 lastRender = nowRender
-nowTick = nowRender
-lastTick = nowRender
 
 
 def asyncThread():
@@ -42,26 +47,36 @@ def renderThread():
 	global nowRender
 	count = 0
 	lastCount = time.perf_counter_ns()
+	nextFrame = lastCount
 	while game.running:
 		try:
 			nowRender = time.perf_counter_ns()
-			# if True or nowRender - lastRender >= 1_000_000:
 			lastRender = nowRender
 			if renderer.dealScreen4to3Change():
 				game.getWindow().onResize()
-			if renderer.peekScaleChange():
-				resourceManager.changeScale()
+			if renderer.peekScaleChange():  # 纹理在用到时才按新的缩放重建
 				if renderer.systemScaleChanged():
 					font.setScale(renderer.getSystemScale() * 0.6)
 				renderer.dealScaleChange()
-			game.render((nowRender - lastTick) / 55_000_000)
+			game.render(tickClock.delta(nowRender))
+			if startupProfiler.enabled:
+				startupProfiler.finish()
 			count += 1
 			if nowRender - lastCount >= 1_000_000_000:
 				renderer.fps = count * 1_000_000_000 / (nowRender - lastCount)
 				count = 0
 				lastCount = nowRender
-			# else:
-			# 	time.sleep(0)
+			interval = renderer.getFrameInterval()
+			if interval != 0:
+				if renderer.vsync:  # 固定节拍，落后太多时不追帧
+					nextFrame += interval
+					if nextFrame < nowRender:
+						nextFrame = nowRender + interval
+				else:
+					nextFrame = nowRender + interval
+				utils.sleepUntil(nextFrame)
+			else:
+				time.sleep(0)
 		except Exception as e:
 			utils.printException(e)
 			game.running = False
@@ -73,21 +88,15 @@ def gameThread():
 	utils.info("游戏线程启动")
 	count = 0
 	lastCount = time.perf_counter_ns()
-	global lastTick
-	global nowTick
+	tickClock.reset()
 	while game.running:
 		try:
+			count += tickClock.run(game.tick)
 			nowTick = time.perf_counter_ns()
-			if nowTick - lastTick >= 44_000_000:
-				lastTick = nowTick
-				game.tick()
-				count += 1
-				if nowTick - lastCount >= 1_000_000_000:
-					renderer.tps = count * 1_000_000_000 / (nowTick - lastCount)
-					lastCount = nowTick
-					count = 0
-			else:
-				time.sleep(0)
+			if nowTick - lastCount >= 1_000_000_000:
+				renderer.tps = count * 1_000_000_000 / (nowTick - lastCount)
+				lastCount = nowTick
+				count = 0
 		except Exception as e:
 			utils.printException(e)
 			game.running = False
@@ -110,17 +119,31 @@ def mainThread():
 		renderer.readConfig(config)
 		utils.readConfig(config)
 		Music_player.readConfig(config)
+		tickScheduler.readConfig(config)
+		ai.readConfig(config)
+		responseCache.readConfig(config)
+		ai.history.load()
 	except Exception as e:
 		utils.printException(e)
 		game.running = False
 	# end 读取设置
+	startupProfiler.mark('config')
 	# 游戏初始化
 	pygame.key.stop_text_input()
 	renderer.setScreen(screen)
-	font.initializeFont()
-	game.setWindow(StartWindow())
+	resourceManager.normalizeFormat()
+	with startupProfiler.measure('font init'):
+		font.initializeFont()
+	with startupProfiler.measure('window StartWindow'):
+		game.setWindow(StartWindow())
+	resourceManager.endPreload()
 	game.floatWindow = FloatWindow()
 	game.hud = Hud()
+	renderer.addDebugInfo('clock', tickClock.describe)
+	renderer.addDebugInfo('font', font.describeCache)
+	renderer.addDebugInfo('ai', requestExecutor.describe)
+	renderer.addDebugInfo('texture', scaledCache.describe)
+	renderer.addDebugInfo('present', renderer.describePresent)
 	# 游戏初始化
 	# 启动线程
 	gt: Thread = Thread(name="GameThread", target=gameThread)
@@ -178,6 +201,7 @@ def mainThread():
 							game.getWindow().passMouseUp(interact.mouse.x, interact.mouse.y, buttons)
 					case pygame.VIDEORESIZE:
 						renderer.setScreen(pygame.display.set_mode(event.size, SCREEN_FLAGS))
+						resourceManager.normalizeFormat()  # 可能被拖到了颜色深度不同的显示器上
 						pygame.display.update()
 						if game.getWindow() is not None:
 							game.getWindow().onResize()
@@ -208,13 +232,19 @@ def mainThread():
 		rt.join()
 	if at.is_alive():
 		at.join()
+	eggJobs.shutdown()
 	# begin 写入设置
 	try:
 		config: dict[str, any] = {}
 		config.update(renderer.writeConfig())
 		config.update(utils.writeConfig())
 		config.update(Music_player.writeConfig())
+		config.update(tickScheduler.writeConfig())
+		config.update(ai.writeConfig())
+		config.update(responseCache.writeConfig())
 		configs.writeConfig(config)
+		ai.history.save()
+		resourceManager.writeManifest()
 	except Exception as e:
 		utils.printException(e)
 		game.running = False
@@ -229,7 +259,9 @@ def mainThread():
 #                       #
 #########################
 if __name__ == '__main__':
-	ret = pygame.init()
+	startupProfiler.mark('imports')
+	with startupProfiler.measure('pygame init'):
+		ret = pygame.init()
 	utils.info(f"pygame初始化成功{ret[0]}模块，失败{ret[1]}模块")
 	mainThread()
 	pygame.quit()
@@ -1,10 +1,19 @@
+from functools import lru_cache
+from importlib.util import find_spec
 from random import Random
 
 import pygame
 from pygame import Surface
 
 from render.renderer import renderer
-from render.resource import resourceManager
+from render.resource import resourceManager, Texture
+from utils.util import utils
+
+if find_spec("numpy") is not None:  # surfarray依赖numpy
+	import pygame.surfarray as surfarray
+else:
+	surfarray = None
+	utils.warn("没有安装numpy，生成蛋会比较慢")
 
 base = resourceManager.getOrNew("egg/base")
 base.adaptsMap(False)
@@ -74,9 +83,18 @@ second = 11
 del t
 
 
-def copySurface(src: Surface, color: int):
+def copySurface(src: Surface, color: int) -> Surface:
+	"""
+	染色。结果的RGB全部为color，透明度取src的红色通道
+	"""
 	sfc = Surface(src.get_size(), flags=pygame.SRCALPHA)
 	cr, cg, cb = (color >> 16) & 0xff, (color >> 8) & 0xff, color & 0xff
+	if surfarray is not None:
+		sfc.fill((cr, cg, cb, 0))
+		alpha = surfarray.pixels_alpha(sfc)
+		alpha[:] = surfarray.array3d(src)[:, :, 0]
+		del alpha  # 释放对sfc的锁定
+		return sfc
 	for i in range(sfc.get_width()):
 		for j in range(sfc.get_height()):
 			r, g, b, a = src.get_at((i, j))
@@ -84,6 +102,16 @@ def copySurface(src: Surface, color: int):
 	return sfc
 
 
+@lru_cache(maxsize=256)
+def recolor(texture: Texture, color: int) -> Surface:
+	"""
+	带缓存的染色，同一图层同一颜色只计算一次。返回的表面是共享的，不要在上面绘制
+	:param texture: 图层纹理
+	:param color: 0xRRGGBB
+	"""
+	return copySurface(texture.getSurface(), color)
+
+
 def __check(lst: list[int], i: int, d: int) -> bool:
 	for j in lst:
 		if abs(i - j) < d:
@@ -91,30 +119,44 @@ def __check(lst: list[int], i: int, d: int) -> bool:
 	return False
 
 
-eggGenerated: Surface | None = None
+def generateEggs(requests: list[tuple[list[int], list[int], int]], random: Random) -> list[Surface]:
+	"""
+	批量生成蛋，例如预先生成图鉴缩略图。相同的图层和颜色只会染色一次
+	:param requests: (style, colors, egg)的列表，含义同composeEgg
+	:param random: 随机数生成器，按顺序用于每个蛋
+	:return: 与requests一一对应的蛋
+	"""
+	return [composeEgg(style, colors, egg, random) for style, colors, egg in requests]
 
 
-def generateEgg(style: list[int], colors: list[int], egg: int, random: Random):
-	sfc: Surface = copySurface(styles[base].getSurface(), egg)
+def composeEgg(style: list[int], colors: list[int], egg: int, random: Random) -> Surface:
+	"""
+	生成一个蛋
+	:param style: 花纹编号列表
+	:param colors: 与style一一对应的花纹颜色
+	:param egg: 蛋壳颜色
+	:param random: 随机数生成器，决定花纹位置
+	"""
+	sfc: Surface = recolor(styles[base], egg).copy()
 	lst = []
 	if runes in style:
 		for i in random.sample(styles[runes], random.randint(4, 8)):
 			y = random.randint(12, 43)
 			x = random.randint(30 - abs(y - 27), abs(y - 27) + 30)
-			sfc.blit(copySurface(i.getSurface(), colors[style.index(runes)]), (x, y))
+			sfc.blit(recolor(i, colors[style.index(runes)]), (x, y))
 	if second in style:
 		y = random.randint(15, 40)
 		while __check(lst, y, 2):
 			y = random.randint(15, 40)
 		lst.append(y)
-		sub = copySurface(styles[second].getSurface(), colors[style.index(second)])
+		sub = recolor(styles[second], colors[style.index(second)])
 		sfc.blit(sub, (28, y))
 	if first in style:
 		y = random.randint(15, 40)
 		while __check(lst, y, 2):
 			y = random.randint(15, 40)
 		lst.append(y)
-		sub = copySurface(styles[first].getSurface(), colors[style.index(first)])
+		sub = recolor(styles[first], colors[style.index(first)])
 		sfc.blit(sub, (28, y))
 	if python in style:
 		y = random.randint(15, 40)
@@ -127,35 +169,34 @@ def generateEgg(style: list[int], colors: list[int], egg: int, random: Random):
 		while __check(lst, y, 3):
 			y = random.randint(15, 40)
 		lst.append(y)
-		sfc.blit(copySurface(styles[heart].getSurface(), colors[style.index(heart)]), (random.randint(28 - abs(y - 27), 28 + abs(y - 27)), y))
+		sfc.blit(recolor(styles[heart], colors[style.index(heart)]), (random.randint(28 - abs(y - 27), 28 + abs(y - 27)), y))
 	if cc in style:
 		y = random.randint(15, 40)
 		while __check(lst, y, 3):
 			y = random.randint(15, 40)
 		lst.append(y)
-		sfc.blit(copySurface(styles[cc].getSurface(), colors[style.index(cc)]), (random.randint(29 - abs(y - 27), 29 + abs(y - 27)), y))
+		sfc.blit(recolor(styles[cc], colors[style.index(cc)]), (random.randint(29 - abs(y - 27), 29 + abs(y - 27)), y))
 	if flower in style:
 		y = random.randint(15, 40)
 		x = random.randint(-abs(y - 27), abs(y - 27)) + 28
-		sfc.blit(copySurface(styles[flower].getSurface(), colors[style.index(flower)]), (x, y))
+		sfc.blit(recolor(styles[flower], colors[style.index(flower)]), (x, y))
 	if music in style:
 		for i in random.sample(styles[music], 1 if random.random() < 0.5 else 2):
 			y = random.randint(10, 40)
 			x = random.randint(10, 40)
-			sfc.blit(copySurface(i.getSurface(), colors[style.index(music)]), (x, y))
+			sfc.blit(recolor(i, colors[style.index(music)]), (x, y))
 	if rabbit in style:
 		y = random.randint(15, 40)
 		while __check(lst, y, 3):
 			y = random.randint(25, 35)
 		lst.append(y)
-		sfc.blit(copySurface(styles[rabbit].getSurface(), colors[style.index(rabbit)]), (26, y))
+		sfc.blit(recolor(styles[rabbit], colors[style.index(rabbit)]), (26, y))
 	if leaves in style:
-		sfc.blit(copySurface(styles[leaves].getSurface(), colors[style.index(leaves)]), (27, 0))
+		sfc.blit(recolor(styles[leaves], colors[style.index(leaves)]), (27, 0))
 	if butterfly in style:
 		y = random.randint(15, 40)
 		while __check(lst, y, 3):
 			y = random.randint(15, 40)
 		lst.append(y)
-		sfc.blit(copySurface(styles[butterfly].getSurface(), colors[style.index(butterfly)]), (27, y))
-	global eggGenerated
-	eggGenerated = sfc
+		sfc.blit(recolor(styles[butterfly], colors[style.index(butterfly)]), (27, y))
+	return sfc
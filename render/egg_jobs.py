@@ -0,0 +1,171 @@
+"""
+蛋的生成任务队列。花纹合成在后台工作线程中进行，不占用asyncio线程和游戏线程。
+每个任务有自己的句柄，可以同时生成多个蛋，互不干扰。
+"""
+from concurrent.futures import Future, ThreadPoolExecutor, CancelledError
+from enum import Enum
+from random import Random
+from threading import Lock
+from typing import Callable
+
+from pygame import Surface
+
+from render.egg_generate import composeEgg
+from utils.util import utils
+
+
+class EggJobStatus(Enum):
+	PENDING = 0  # 等待花纹和颜色，例如等待AI回复
+	COMPOSITING = 1  # 正在合成
+	DONE = 2
+	FAILED = 3
+	CANCELLED = 4
+
+
+class EggJob:
+	"""
+	一个蛋的生成任务。状态查询和取消可以在任何线程中进行
+	"""
+	
+	def __init__(self, random: Random):
+		self.random: Random = random
+		"""
+		任务私有的随机数生成器，不与游戏线程共用
+		"""
+		self._lock: Lock = Lock()
+		self._status: EggJobStatus = EggJobStatus.PENDING
+		self._result: Surface | None = None
+		self._error: BaseException | None = None
+		self._future: Future | None = None
+		self._onCancel: list[Callable[[], None]] = []
+	
+	def getStatus(self) -> EggJobStatus:
+		return self._status
+	
+	def done(self) -> bool:
+		"""
+		:return: 是否已经结束（完成、失败或取消）
+		"""
+		return self._status.value >= EggJobStatus.DONE.value
+	
+	def cancelled(self) -> bool:
+		return self._status == EggJobStatus.CANCELLED
+	
+	def result(self) -> Surface | None:
+		"""
+		不阻塞。未完成、失败或取消时返回None
+		"""
+		return self._result
+	
+	def error(self) -> BaseException | None:
+		return self._error
+	
+	def cancel(self) -> bool:
+		"""
+		取消任务。已经在合成的蛋会被合成完，但结果会被丢弃
+		:return: 是否成功取消，已经结束的任务返回False
+		"""
+		with self._lock:
+			if self.done():
+				return False
+			self._status = EggJobStatus.CANCELLED
+			future = self._future
+			callbacks, self._onCancel = self._onCancel, []
+		if future is not None:
+			future.cancel()
+		for c in callbacks:
+			try:
+				c()
+			except Exception as e:
+				utils.printException(e)
+		return True
+	
+	def addCancelCallback(self, callback: Callable[[], None]) -> None:
+		"""
+		任务取消时调用，例如取消对应的asyncio任务。可能在任何线程中调用
+		"""
+		with self._lock:
+			if not self.cancelled():
+				self._onCancel.append(callback)
+				return
+		callback()
+	
+	def _start(self, future: Future) -> bool:
+		with self._lock:
+			if self.done():
+				return False
+			self._status = EggJobStatus.COMPOSITING
+			self._future = future
+			return True
+	
+	def _finish(self, future: Future) -> None:
+		with self._lock:
+			if self.done():
+				return
+			try:
+				self._result = future.result()
+				self._status = EggJobStatus.DONE
+			except CancelledError:
+				self._status = EggJobStatus.CANCELLED
+			except Exception as e:
+				self._error = e
+				self._status = EggJobStatus.FAILED
+		if self._error is not None:
+			utils.printException(self._error)
+	
+	def fail(self, error: BaseException) -> None:
+		with self._lock:
+			if self.done():
+				return
+			self._error = error
+			self._status = EggJobStatus.FAILED
+		utils.printException(error)
+
+
+class EggJobQueue:
+	def __init__(self, workers: int = 2):
+		self.workers: int = workers
+		self._executor: ThreadPoolExecutor | None = None
+		self._lock: Lock = Lock()
+	
+	def create(self, random: Random) -> EggJob:
+		"""
+		创建一个等待花纹的任务。花纹确定后调用compose
+		:param random: 用于派生任务私有的随机数生成器，只在调用线程中使用一次
+		"""
+		return EggJob(Random(random.getrandbits(64)))
+	
+	def compose(self, job: EggJob, style: list[int], colors: list[int], egg: int) -> None:
+		"""
+		把任务交给工作线程合成。参数含义同egg_generate.composeEgg。已取消的任务会被忽略
+		"""
+		if job.done():
+			return
+		with self._lock:
+			if self._executor is None:
+				self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='EggWorker')
+			future = self._executor.submit(composeEgg, style, colors, egg, job.random)
+		if job._start(future):
+			future.add_done_callback(job._finish)
+		else:
+			future.cancel()
+	
+	def submit(self, style: list[int], colors: list[int], egg: int, random: Random) -> EggJob:
+		"""
+		花纹已经确定时直接合成
+		"""
+		job = self.create(random)
+		self.compose(job, style, colors, egg)
+		return job
+	
+	def shutdown(self) -> None:
+		"""
+		退出时调用。丢弃尚未开始的任务
+		"""
+		with self._lock:
+			executor, self._executor = self._executor, None
+		if executor is not None:
+			executor.shutdown(wait=True, cancel_futures=True)
+
+
+eggJobs: EggJobQueue = EggJobQueue()
@@ -1,3 +1,7 @@
+from collections import OrderedDict
+from threading import Lock
+
+import pygame.display
 import pygame.font
 from pygame import Surface
 
@@ -5,6 +9,15 @@ from utils.util import utils, times
 
 fontHeight: int = 30
 
+cacheCapacity: int = 2048
+"""
+文字表面缓存的容量。同一段文字、颜色、样式只光栅化一次，超出容量时淘汰最久未用的
+"""
+cacheHits: int = 0
+cacheMisses: int = 0
+_cache: OrderedDict[tuple, tuple[Surface, Surface | None]] = OrderedDict()
+_cacheLock: Lock = Lock()
+
 
 class Font:
 	def __init__(self, file: str, yOffset: int = 0, halfSize: bool = False):
@@ -35,8 +48,34 @@ class Font:
 		return self._font
 	
 	def draw(self, screen: Surface, string: str, x: int, y: int, color: int, bold: bool, italic: bool, underline: bool, strikeThrough: bool, background: int) -> int:
+		global cacheHits, cacheMisses
 		if string is None:
 			return 0
+		key = (self, fontHeight, string, color, background, bold, italic, underline, strikeThrough)
+		with _cacheLock:
+			cached = _cache.get(key)
+			if cached is not None:
+				_cache.move_to_end(key)
+				cacheHits += 1
+		if cached is None:
+			cached = self._render(string, color, bold, italic, underline, strikeThrough, background)
+			with _cacheLock:
+				cacheMisses += 1
+				_cache[key] = cached
+				while len(_cache) > cacheCapacity:
+					_cache.popitem(False)
+		surface, bgs = cached
+		if bgs is not None:
+			screen.blit(bgs, (x, y - self._scaledOffset))
+		screen.blit(surface, (x, y - self._scaledOffset))
+		return surface.get_width()
+	
+	def _render(self, string: str, color: int, bold: bool, italic: bool, underline: bool, strikeThrough: bool, background: int) -> tuple[Surface, Surface | None]:
+		"""
+		光栅化一段文字
+		:return: 文字表面，背景表面（背景全透明时为None）
+		"""
+		bgs = None
 		if (color & 0xffffff) != (background & 0xffffff):
 			bg = ((background >> 16) & 0xff, (background >> 8) & 0xff, background & 0xff)
 			surface: Surface = self.get(bold, italic, underline, strikeThrough).render(string, True, ((color >> 16) & 0xff, (color >> 8) & 0xff, color & 0xff), bg)
@@ -46,7 +85,6 @@ class Font:
 				bgs = Surface(surface.get_size())
 				bgs.fill(bg)
 				bgs.set_alpha(background >> 24)
-				screen.blit(bgs, (x, y - self._scaledOffset))
 		else:
 			bg1 = ((background >> 16) & 0xff, (background >> 8) & 0xff, background & 0xff)
 			bg = [(background >> 16) & 0xff, (background >> 8) & 0xff, background & 0xff]
@@ -70,9 +108,11 @@ class Font:
 				bgs = Surface(surface.get_size())
 				bgs.fill(bg1)
 				bgs.set_alpha(background >> 24)
-				screen.blit(bgs, (x, y - self._scaledOffset))
-		screen.blit(surface, (x, y - self._scaledOffset))
-		return surface.get_width()
+		if pygame.display.get_surface() is not None:  # 转换为屏幕格式，之后每次绘制不再逐像素转换
+			surface = surface.convert()
+			if bgs is not None:
+				bgs = bgs.convert()
+		return surface, bgs
 	
 	def setHeight(self, h: int) -> None:
 		self._file.close()
@@ -90,9 +130,20 @@ realFontHeight: int = 0
 realHalfHeight: int = 0
 
 
+def clearCache() -> None:
+	with _cacheLock:
+		_cache.clear()
+
+
+def describeCache() -> str:
+	total = cacheHits + cacheMisses
+	return f"glyph {len(_cache)} hit {cacheHits * 100 / total if total != 0 else 0:.1f}% miss {cacheMisses}"
+
+
 def setScale(scale: float) -> None:
 	global fontHeight, realFontHeight, realHalfHeight
 	fontHeight = int(scale)
+	clearCache()
 	for i, f in allFonts.items():
 		f.setHeight(fontHeight)
 	realFontHeight = allFonts[0].get(False, False, False, False).get_height()
@@ -1,5 +1,7 @@
+import math
+from collections import OrderedDict
 from enum import Enum
-from typing import Union, TYPE_CHECKING
+from typing import Union, TYPE_CHECKING, Callable
 
 from interact.interacts import interact
 from render import font
@@ -11,7 +13,7 @@ if TYPE_CHECKING:
 	from entity.entity import Entity
 
 import pygame
-from pygame import Surface
+from pygame import Surface, Rect
 from utils.vector import Vector, BlockVector
 from utils.error import IllegalStatusException, InvalidOperationException
 from utils.sync import SynchronizedStorage
@@ -67,6 +69,9 @@ class Renderer:
 		self._size: tuple[float, float] = (0, 0)
 		
 		self._canvas: Surface | None = None  # 用于预绘制的画布
+		self._batch: list[tuple] | None = None  # 合批中的地图绘制，见beginBatch
+		self._overlays: OrderedDict[tuple, Surface] = OrderedDict()  # 半透明叠加用的临时表面，见getOverlay
+		self.overlayCapacity: int = 32
 		self._canvasSize: BlockVector = BlockVector()
 		self._canvasCenter: BlockVector = BlockVector()
 		
@@ -96,6 +101,35 @@ class Renderer:
 		self.tps: float = 0
 		self.fps: float = 0
 		self.lockScroll: bool = False
+		self._debugInfo: dict[str, Callable[[], str]] = {}
+		
+		self.dirtyRect: bool = False
+		"""
+		记录本帧通过renderAtMap、renderAsBlock、fill、blit、renderString进行的绘制，与上一帧按顺序比较，
+		只向屏幕提交内容或位置变化了的绘制所在的区域，画面不变时不提交。有窗口直接向getCanvas()绘制时退回整体提交
+		"""
+		self._drawn: list[tuple] = []  # 本帧的绘制：(内容, x, y, w, h)，见_record
+		self._lastDrawn: list[tuple] = []  # 上一帧的绘制。同时保留了其中的表面，表面的id不会被新表面重复使用
+		self._fresh: list[Surface] = []  # 本帧通过getOverlay取得的表面，内容已被改写
+		self._canvasTouched: bool = False  # 本帧通过getCanvas直接绘制过，改动区域未知
+		self._presented: tuple[int, int] = (0, 0)  # 上一帧提交的画布区域数和像素数，-1个区域为整体提交
+		self._lastOverlayHeight: int = 0
+		self._presentAll: bool = True
+		
+		self.maxFPS: int = 60
+		"""
+		帧率上限，0为不限制
+		"""
+		self.vsync: bool = False
+		"""
+		按固定节拍出帧（类似垂直同步），目标帧率取显示器刷新率。帧间隔更均匀
+		"""
+		self.adaptiveFPS: bool = True
+		"""
+		TPS低于20时降低帧率，把时间让给游戏线程
+		"""
+		self._throttled: bool = False
+		self._refreshRate: int = 0
 	
 	def setScreen(self, screen: Surface) -> None:
 		"""
@@ -121,7 +155,10 @@ class Renderer:
 			self.setSystemScale(min(self._size[0] // 16, self._size[1] // 9))
 		self._canvasSize = BlockVector(self._size[0], self._size[1]).subtract(self._offset).subtract(self._offset)
 		self._canvas = Surface(self._canvasSize.getTuple())
+		self._overlays = OrderedDict()  # 尺寸和像素格式都可能变了
 		self._canvasCenter.set(self._canvasSize.x >> 1, self._canvasSize.y >> 1)
+		self._presentAll = True
+		self._refreshRate = 0  # 窗口可能被拖到了另一个显示器上
 	
 	def cameraAt(self, entity: Union['Entity', None]) -> 'Entity':
 		e = self._cameraAt
@@ -161,7 +198,8 @@ class Renderer:
 		self._mapObjectBasis = self._mapBasis.clone().subtract(self._mapScale >> 1, self._mapScale >> 1)
 		self.is4to3.apply(self.is4to3.getNew())
 		# end apply sync
-		self._screen.fill(0)
+		if not self.dirtyRect:
+			self._screen.fill(0)
 		self._canvas.fill(0)
 		
 	def end(self) -> None:
@@ -171,18 +209,153 @@ class Renderer:
 		"""
 		if not self._isRendering:
 			raise IllegalStatusException("尝试结束绘制，但是绘制尚未开始。")
-		self._screen.blit(self._canvas, self._offset.getTuple())
+		self.endBatch()
+		rects = self._changedRects() if self.dirtyRect and not self._presentAll and not self._canvasTouched else None
+		if rects is not None:
+			pixels = sum([r.w * r.h for r in rects])
+			if pixels >= self._canvasSize.x * self._canvasSize.y:  # 区域互相重叠，加起来比整个画布还大
+				rects = None
+		if rects is None:
+			if self.dirtyRect:
+				self._screen.fill(0)
+			self._screen.blit(self._canvas, self._offset.getTuple())
+			self._renderOverlay()
+			pygame.display.flip()
+			self._presented = (-1, self._canvasSize.x * self._canvasSize.y)
+		else:
+			self._presented = (len(rects), pixels)
+			height = self._overlayHeight()
+			top = max(height, self._lastOverlayHeight)  # 调试信息直接画在屏幕上，上一帧的也要擦掉
+			self._lastOverlayHeight = height
+			if top > 0:
+				rects.append(Rect(0, 0, self._size[0], top))
+			for r in rects:
+				self._screen.set_clip(r)
+				self._screen.fill(0)
+				self._screen.blit(self._canvas, self._offset.getTuple())
+			self._screen.set_clip(None)
+			self._renderOverlay()
+			if len(rects) > 0:  # 什么也没画时不提交
+				pygame.display.update(rects)
+		self._presentAll = self._canvasTouched or not self.dirtyRect  # 直接画在画布上的内容下一帧可能消失，位置未知，也要整体提交
+		self._canvasTouched = False
+		self._lastDrawn, self._drawn = self._drawn, []
+		self._fresh.clear()
+		self._isRendering = False
+	
+	def getFrameInterval(self) -> int:
+		"""
+		应当仅在main.py, renderThread中调用
+		:return: 两帧之间的目标间隔（纳秒），0为不限制
+		"""
+		fps = self.maxFPS
+		if self.vsync:
+			fps = self.getRefreshRate()
+		if self.adaptiveFPS and self.tps != 0:
+			if self._throttled:
+				self._throttled = self.tps < 21
+			else:
+				self._throttled = self.tps < 20
+			if self._throttled:
+				fps = 30 if fps == 0 else min(fps, max(20, fps >> 1))  # 不会因此高于设定的帧率
+		return 0 if fps == 0 else 1_000_000_000 // fps
+	
+	def getRefreshRate(self) -> int:
+		"""
+		:return: 显示器刷新率，取不到时为60
+		"""
+		if self._refreshRate == 0:
+			self._refreshRate = 60
+			try:
+				rates = pygame.display.get_desktop_refresh_rates()
+				if len(rates) > 0 and rates[0] > 0:
+					self._refreshRate = rates[0]
+			except (AttributeError, pygame.error):
+				pass
+		return self._refreshRate
+	
+	def _overlayHeight(self) -> int:
+		lines = (1 if self.displayFPS else 0) + ((1 + len(self._debugInfo)) if self.displayTPS else 0)
+		return lines * font.realHalfHeight
+	
+	def _renderOverlay(self) -> None:
+		"""
+		在屏幕右上角画FPS、TPS和调试信息
+		"""
+		y = 0
 		if self.displayFPS:
 			r = RenderableString(f"\\12{self.fps:.2f} FPS")
-			r.renderAt(self._screen, int(self._size[0] - r.length()), 0, 0xffee0000)
-			if self.displayTPS:
-				r = RenderableString(f"\\12{self.tps:.2f} TPS")
-				r.renderAt(self._screen, int(self._size[0] - r.length()), font.realHalfHeight, 0xffee0000)
-		elif self.displayTPS:
+			r.renderAt(self._screen, int(self._size[0] - r.length()), y, 0xffee0000)
+			y += font.realHalfHeight
+		if self.displayTPS:
 			r = RenderableString(f"\\12{self.tps:.2f} TPS")
-			r.renderAt(self._screen, int(self._size[0] - r.length()), 0, 0xffee0000)
-		pygame.display.flip()
-		self._isRendering = False
+			r.renderAt(self._screen, int(self._size[0] - r.length()), y, 0xffee0000)
+			y += font.realHalfHeight
+			for supplier in self._debugInfo.values():
+				r = RenderableString(f"\\12{supplier()}")
+				r.renderAt(self._screen, int(self._size[0] - r.length()), y, 0xffee0000)
+				y += font.realHalfHeight
+	
+	DIRTY_MERGE: int = 32
+	"""
+	改动区域多于这个数时合并为一个矩形提交
+	"""
+	
+	def _changedRects(self) -> list[Rect]:
+		"""
+		按顺序比较本帧和上一帧的绘制，去掉开头和结尾相同的部分。剩下的部分数量相同时逐个比较，否则全部算作变化。
+		返回变化了的绘制在两帧中所在的区域，换算为屏幕坐标。其余区域被同样的绘制以同样的顺序覆盖，画面与上一帧相同
+		"""
+		drawn, last = self._drawn, self._lastDrawn
+		n = min(len(drawn), len(last))
+		i = 0
+		while i < n and drawn[i] == last[i]:
+			i += 1
+		j = 0
+		while j < n - i and drawn[-1 - j] == last[-1 - j]:
+			j += 1
+		drawn = drawn[i:len(drawn) - j]
+		last = last[i:len(last) - j]
+		if len(drawn) == len(last):
+			changed = [d for a, b in zip(drawn, last) if a != b for d in (a, b)]
+		else:
+			changed = drawn + last
+		if len(changed) == 0:
+			return []
+		rects = [Rect(d[1], d[2], d[3], d[4]) for d in changed]
+		if len(rects) > self.DIRTY_MERGE:
+			rects = [rects[0].unionall(rects)]
+		ox, oy = self._offset.getTuple()
+		bounds = self._canvas.get_rect()
+		ret: list[Rect] = []
+		for r in rects:
+			r = r.clip(bounds)
+			if r.w > 0 and r.h > 0:
+				ret.append(r.move(ox, oy))
+		return ret
+	
+	def _record(self, content, x: float, y: float, w: float, h: float) -> None:
+		"""
+		:param content: 决定所画内容的值，与上一帧同一次绘制的相等（表面按是否为同一个对象比较）时认为没有变化
+		"""
+		self._drawn.append((content, int(x), int(y), int(w) + 1, int(h) + 1))
+	
+	def describePresent(self) -> str:
+		"""
+		调试信息：上一帧向屏幕提交了多少画布区域
+		"""
+		count, pixels = self._presented
+		if count < 0:
+			return f"present: all, {pixels} px"
+		return f"present: {count} rects, {pixels} px ({pixels * 100 / max(1, self._canvasSize.x * self._canvasSize.y):.1f}%)"
+	
+	def addDebugInfo(self, name: str, supplier: Callable[[], str]) -> None:
+		"""
+		添加一行调试信息，开启displayTPS时显示在TPS下方
+		:param name: 名称，同名的会被替换
+		:param supplier: 每帧调用，返回要显示的文本
+		"""
+		self._debugInfo[name] = supplier
 	
 	def assertRendering(self) -> None:
 		"""
@@ -209,8 +382,51 @@ class Renderer:
 		return self._canvasCenter.clone()
 	
 	def getCanvas(self) -> Surface:
+		"""
+		合批中取画布时会先画出已经排队的内容，保证绘制顺序不变。
+		直接向画布绘制时无法知道改动了哪里，开启dirtyRect时本帧和下一帧会整体提交，能用blit等方法时尽量使用
+		"""
+		if self._batch:
+			self.flushBatch()
+		self._canvasTouched = True
 		return self._canvas
 	
+	def blit(self, src: Surface, at: tuple[int, int], content=None) -> None:
+		"""
+		按屏幕位置把图像画到画布上
+		:param content: 图像是本帧画好的（例如getOverlay取得的表面、刚渲染的文字）时，可以传入完全决定其内容的值，与上一帧相同时不重新提交。
+		不传入时，本帧取得的临时表面总是算作变化，其他表面按是否为同一个对象判断
+		"""
+		if self._batch:
+			self.flushBatch()
+		if self.dirtyRect:
+			if content is not None:
+				content = ('blit', content)
+			elif any(s is src for s in self._fresh):
+				content = object()
+			else:
+				content = src
+			self._record(content, at[0], at[1], src.get_width(), src.get_height())
+		self._canvas.blit(src, at)
+	
+	def beginBatch(self) -> None:
+		"""
+		开始合批。之后的renderAtMap、renderAsBlock只记录(图像, 位置, 区域)，在flushBatch时用一次Surface.blits画出。
+		其他方式的绘制（fill、renderString、getCanvas等）会先画出已经记录的部分，所以可以随意混用
+		"""
+		if self._batch is None:
+			self._batch = []
+	
+	def flushBatch(self) -> None:
+		batch = self._batch
+		if batch:
+			self._canvas.blits(batch, False)
+			batch.clear()
+	
+	def endBatch(self) -> None:
+		self.flushBatch()
+		self._batch = None
+	
 	def getScreen(self) -> Surface:
 		return self._screen
 	
@@ -226,13 +442,38 @@ class Renderer:
 	def getMapBasis(self) -> BlockVector:
 		return self._mapBasis
 	
+	def getOverlay(self, size: tuple[int, int], alpha: int, colorkey: tuple[int, int, int] | None = None) -> Surface:
+		"""
+		取得可重复使用的临时表面，整体透明度和透明色已经设置好，内容是上次使用留下的，需要自己清空。
+		只在绘制线程中使用，用完（画到画布上）之后就不要再保留。窗口大小改变时全部丢弃
+		"""
+		key = (size, alpha, colorkey)
+		overlays = self._overlays
+		s = overlays.get(key)
+		if s is not None:
+			overlays.move_to_end(key)
+		else:
+			s = Surface(size)
+			s.set_alpha(alpha)
+			if colorkey is not None:
+				s.set_colorkey(colorkey)
+			overlays[key] = s
+			if len(overlays) > self.overlayCapacity:
+				overlays.popitem(False)
+		if self.dirtyRect:
+			self._fresh.append(s)
+		return s
+	
 	def fill(self, color: int, x: int, y: int, w: int, h: int) -> None:
+		if self._batch:
+			self.flushBatch()
+		if self.dirtyRect:
+			self._record(color, x, y, w, h)
 		if color & 0xff000000 == 0xff000000:
 			self._canvas.fill(((color >> 16) & 0xff, (color >> 8) & 0xff, color & 0xff), (x, y, w, h))
 		else:
-			s = Surface((w, h))
+			s = self.getOverlay((w, h), color >> 24)
 			s.fill(((color >> 16) & 0xff, (color >> 8) & 0xff, color & 0xff))
-			s.set_alpha(color >> 24)
 			self._canvas.blit(s, (x, y))
 	
 	def renderAtMap(self, src: Surface, mapPoint: Vector, fromPos: Vector | None = None, fromSize: Vector | None = None, pxOffset: BlockVector = None) -> None:
@@ -240,24 +481,46 @@ class Renderer:
 		按地图的方式渲染目标，会忽略margin，会考虑camera
 		"""
 		self.assertRendering()
-		dst = self._canvas
+		scale = self._mapScale
+		basis = self._mapObjectBasis
 		if fromPos is None or fromSize is None:
-			p = (mapPoint * self._mapScale).getBlockVector().add(self._mapObjectBasis)
-			if pxOffset is not None:
-				p.add(pxOffset)
-			dst.blit(src, p.getTuple())
+			x, y = math.floor(mapPoint.x * scale) + basis.x, math.floor(mapPoint.y * scale) + basis.y
+			area = None
+		else:
+			x, y = math.floor((mapPoint.x + fromPos.x) * scale) + basis.x, math.floor((mapPoint.y + fromPos.y) * scale) + basis.y
+			area = (fromPos.x, fromPos.y, fromSize.x, fromSize.y)
+		if pxOffset is not None:
+			x += pxOffset.x
+			y += pxOffset.y
+		if self.dirtyRect:
+			if area is None:
+				self._record(src, x, y, src.get_width(), src.get_height())
+			else:
+				self._record((src, area), x, y, area[2], area[3])
+		if self._batch is not None:
+			self._batch.append((src, (x, y)) if area is None else (src, (x, y), area))
+		elif area is None:
+			self._canvas.blit(src, (x, y))
 		else:
-			p = ((mapPoint + fromPos) * self._mapScale).getBlockVector().add(self._mapObjectBasis)
-			if pxOffset is not None:
-				p.add(pxOffset)
-			dst.blit(src, p.getTuple(), (fromPos.x, fromPos.y, fromSize.x, fromSize.y))
+			self._canvas.blit(src, (x, y), area)
 	
 	def renderAsBlock(self, src: Surface, mapPoint: BlockVector | Vector, fromPos: BlockVector | None = None, fromSize: BlockVector | None = None):
 		self.assertRendering()
+		scale = self._mapScale
+		basis = self._mapBasis
 		if fromPos is None or fromSize is None:
-			self._canvas.blit(src, self._mapBasis.clone().add(mapPoint.clone().multiply(self._mapScale)).getTuple())
+			item = (src, (basis.x + mapPoint.x * scale, basis.y + mapPoint.y * scale))
 		else:
-			self._canvas.blit(src, self._mapBasis.clone().add((mapPoint + fromPos).multiply(self._mapScale)).getTuple(), (fromPos.x, fromPos.y, fromSize.x, fromSize.y))
+			item = (src, (basis.x + (mapPoint.x + fromPos.x) * scale, basis.y + (mapPoint.y + fromPos.y) * scale), (fromPos.x, fromPos.y, fromSize.x, fromSize.y))
+		if self.dirtyRect:
+			if fromSize is None:
+				self._record(src, item[1][0], item[1][1], src.get_width(), src.get_height())
+			else:
+				self._record((src, item[2]), item[1][0], item[1][1], fromSize.x, fromSize.y)
+		if self._batch is not None:
+			self._batch.append(item)
+		else:
+			self._canvas.blit(*item)
 	
 	def renderString(self, text: RenderableString, x: int, y: int, defaultColor: int, location: Location = Location.LEFT_TOP, defaultBackground: int = 0, forceSize: int = 0) -> None:
 		"""
@@ -272,27 +535,25 @@ class Renderer:
 		self.assertRendering()
 		if len(text.set) == 0:
 			return
+		if self._batch:
+			self.flushBatch()
 		height = font.realFontHeight if text.set[0].font < 10 or forceSize == 1 else font.realHalfHeight
 		renderFunction = text.renderSmall if forceSize == -1 else text.renderGiant if forceSize == 1 else text.renderAt
 		match location:
-			case Location.LEFT_TOP:
-				renderFunction(self._canvas, x, y, defaultColor, defaultBackground)
-			case Location.LEFT:
-				renderFunction(self._canvas, x, y - (height >> 1), defaultColor, defaultBackground)
-			case Location.LEFT_BOTTOM:
-				renderFunction(self._canvas, x, y - height, defaultColor, defaultBackground)
-			case Location.TOP:
-				renderFunction(self._canvas, x - ((text.lengthSmall() if forceSize == -1 else text.lengthGiant() if forceSize == 1 else text.length()) >> 1), y, defaultColor, defaultBackground)
-			case Location.CENTER:
-				renderFunction(self._canvas, x - ((text.lengthSmall() if forceSize == -1 else text.lengthGiant() if forceSize == 1 else text.length()) >> 1), y - (height >> 1), defaultColor, defaultBackground)
-			case Location.BOTTOM:
-				renderFunction(self._canvas, x - ((text.lengthSmall() if forceSize == -1 else text.lengthGiant() if forceSize == 1 else text.length()) >> 1), y - height, defaultColor, defaultBackground)
-			case Location.RIGHT_TOP:
-				renderFunction(self._canvas, x - (text.lengthSmall() if forceSize == -1 else text.lengthGiant() if forceSize == 1 else text.length()), y, defaultColor, defaultBackground)
-			case Location.RIGHT:
-				renderFunction(self._canvas, x - (text.lengthSmall() if forceSize == -1 else text.lengthGiant() if forceSize == 1 else text.length()), y - (height >> 1), defaultColor, defaultBackground)
-			case Location.RIGHT_BOTTOM:
-				renderFunction(self._canvas, x - (text.lengthSmall() if forceSize == -1 else text.lengthGiant() if forceSize == 1 else text.length()), y - height, defaultColor, defaultBackground)
+			case Location.LEFT_TOP | Location.LEFT | Location.LEFT_BOTTOM:
+				pass
+			case Location.TOP | Location.CENTER | Location.BOTTOM:
+				x -= (text.lengthSmall() if forceSize == -1 else text.lengthGiant() if forceSize == 1 else text.length()) >> 1
+			case Location.RIGHT_TOP | Location.RIGHT | Location.RIGHT_BOTTOM:
+				x -= text.lengthSmall() if forceSize == -1 else text.lengthGiant() if forceSize == 1 else text.length()
+		match location:
+			case Location.LEFT | Location.CENTER | Location.RIGHT:
+				y -= height >> 1
+			case Location.LEFT_BOTTOM | Location.BOTTOM | Location.RIGHT_BOTTOM:
+				y -= height
+		right = renderFunction(self._canvas, x, y, defaultColor, defaultBackground)
+		if self.dirtyRect:  # 解析结果的各段不会被修改，相同的文字会共享缓存中的同一批对象。字体有上下偏移，多算一些
+			self._record((tuple(text.set), defaultColor, defaultBackground, forceSize), x, y - (height >> 2), right - x, height + (height >> 1))
 	
 	def setUiScale(self, scl: float) -> None:
 		self._customUiScale = scl
@@ -307,6 +568,9 @@ class Renderer:
 	def getSystemScale(self) -> float:
 		return self._systemScale
 	
+	def getUiScale(self) -> float:
+		return self._uiScale
+	
 	def setCustomMapScale(self, scl: float) -> None:
 		self._customMapScale = scl
 		self._mapScaleChanged = True
@@ -381,6 +645,10 @@ class Renderer:
 		self.displayFPS = configs.readElseDefault(config, "displayFPS", False, {True: True, False: False}, "displayFPS: {} is not supported. Using false.")
 		self.displayTPS = configs.readElseDefault(config, "displayTPS", False, {True: True, False: False}, "displayTPS: {} is not supported. Using false.")
 		self.lockScroll = configs.readElseDefault(config, "lockScroll", False, {True: True, False: False}, "lockScroll: {} is not supported. Using false.")
+		self.maxFPS = configs.readElseDefault(config, "maxFPS", 60, lambda i: int(utils.frange(i, 0, 1000)))
+		self.vsync = configs.readElseDefault(config, "vsync", False, {True: True, False: False}, "vsync: {} is not supported. Using false.")
+		self.adaptiveFPS = configs.readElseDefault(config, "adaptiveFPS", True, {True: True, False: False}, "adaptiveFPS: {} is not supported. Using true.")
+		self.dirtyRect = configs.readElseDefault(config, "dirtyRect", False, {True: True, False: False}, "dirtyRect: {} is not supported. Using false.")
 		
 	def writeConfig(self) -> dict[str, any]:
 		return {
@@ -388,6 +656,10 @@ class Renderer:
 			"customScale": self._customMapScale,
 			"displayFPS": self.displayFPS,
 			"displayTPS": self.displayTPS,
+			"maxFPS": self.maxFPS,
+			"vsync": self.vsync,
+			"adaptiveFPS": self.adaptiveFPS,
+			"dirtyRect": self.dirtyRect,
 			"lockScroll": self.lockScroll
 		}
 
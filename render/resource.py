@@ -1,9 +1,17 @@
+import json
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from collections import OrderedDict
 from threading import Lock
+from typing import Callable, Iterable
 
+import pygame.display
 import pygame.image
 from pygame import Surface
 from utils.vector import Vector, BlockVector
+from render import font
 from render.renderer import renderer
+from utils.startup import startupProfiler
 from utils.util import utils
 
 
@@ -15,37 +23,61 @@ class Texture:
 	注意，资源渲染的计算方式不同。如果是基于地图渲染，请使用renderAtMap，会根据game.camera等自动计算相对位置。Vector给出相对于地图的位置。如果是基于屏幕渲染，例如额外窗口、UI部分，请使用renderAtInterface，会自动适应margin等，并采用Vector给出浮点数的屏幕相对值。
 	"""
 	
-	def __init__(self, file: str):
+	def __init__(self, file: str, surface: Surface | None = None):
+		"""
+		:param file: 纹理名，对应assets/texture/{file}.bmp
+		:param surface: 已经解码好的图像（例如ResourceManager预加载的），为None时从文件读取
+		"""
 		self._mapObject: bool = True
 		self._uiObject: bool = False
 		self._systemObject: bool = False
-		self._file = open(f'assets/texture/{file}.bmp', 'rb')
-		self._surface: Surface = pygame.image.load_basic(self._file)
+		self._surface: Surface = surface if surface is not None else Texture.load(file)
 		self.systemScaleOffset: float = 0.0252
 		self.uiScaleOffset: float = 0.0252
-		self._mapScaled: Surface | None = renderer.mapScaleSurface(self._surface) if self._mapObject else None
-		self._uiScaled: Surface | None = None
-		self._systemScaled: Surface | None = None
 		self._offset: Vector | None = None
 	
+	@staticmethod
+	def load(file: str) -> Surface:
+		"""
+		读取并解码纹理文件，读完即关闭。可以在任何线程中调用
+		"""
+		with open(f'assets/texture/{file}.bmp', 'rb') as f:
+			return pygame.image.load_basic(f)
+	
+	@staticmethod
+	def displayFormat(surface: Surface) -> Surface:
+		"""
+		转换为屏幕的像素格式，保留透明色和整体透明度。带逐像素透明度的保留透明通道。必须已经设置了显示模式
+		"""
+		return surface.convert_alpha() if surface.get_flags() & pygame.SRCALPHA else surface.convert()
+	
+	def convert(self) -> None:
+		"""
+		把原图转换为屏幕的像素格式，之后的绘制不再需要逐像素转换。缩放结果由原图生成，格式相同
+		"""
+		self._surface = Texture.displayFormat(self._surface)
+	
 	def adaptsMap(self, val: bool = True) -> None:
-		if self._mapObject != val:
-			self._mapObject = val
-			self._mapScaled: Surface | None = renderer.mapScaleSurface(self._surface)
+		self._mapObject = val
 	
 	def adaptsUI(self, val: bool = True) -> None:
-		if self._uiObject != val:
-			self._uiObject = val
-			self._uiScaled: Surface | None = renderer.uiScaleSurface(self._surface, self.uiScaleOffset)
+		self._uiObject = val
 	
 	def adaptsSystem(self, val: bool = True) -> None:
-		if self._systemObject != val:
-			self._systemObject = val
-			self._systemScaled: Surface | None = renderer.systemScaleSurface(self._surface, self.systemScaleOffset)
+		self._systemObject = val
+	
+	def _mapVariant(self) -> Surface:
+		return renderer.mapScaleSurface(self._surface)
+	
+	def _uiVariant(self) -> Surface:
+		return renderer.uiScaleSurface(self._surface, self.uiScaleOffset)
+	
+	def _systemVariant(self) -> Surface:
+		return renderer.systemScaleSurface(self._surface, self.systemScaleOffset)
 	
 	def renderAtInterface(self, at: BlockVector = BlockVector()) -> None:
-		s = self._uiScaled if self._uiScaled is not None else self._systemScaled if self._systemScaled is not None else self._surface
-		renderer.getCanvas().blit(s, at.getTuple())
+		s = self.getUiScaledSurface() if self._uiObject else self.getSystemScaledSurface()
+		renderer.blit(s if s is not None else self._surface, at.getTuple())
 	
 	def renderAsBlock(self, at: BlockVector, fromPos: BlockVector | None = None, fromSize: BlockVector | None = None):
 		"""
@@ -55,7 +87,8 @@ class Texture:
 		:param fromSize: 源图截取大小
 		:return:
 		"""
-		renderer.renderAsBlock(self._mapScaled if self._mapScaled is not None else self._surface, at if self._offset is None else self._offset + at.getVector(), fromPos, fromSize)
+		s = self.getMapScaledSurface()
+		renderer.renderAsBlock(s if s is not None else self._surface, at if self._offset is None else self._offset + at.getVector(), fromPos, fromSize)
 	
 	def renderAtMap(self, at: Vector, fromPos: Vector | None = None, fromSize: Vector | None = None):
 		"""
@@ -65,19 +98,8 @@ class Texture:
 		:param fromSize: 源图截取大小
 		:return:
 		"""
-		renderer.renderAtMap(self._mapScaled if self._mapScaled is not None else self._surface, at if self._offset is None else at + self._offset, fromPos, fromSize)
-	
-	def changeMapScale(self) -> None:
-		if self._mapObject:
-			self._mapScaled = renderer.mapScaleSurface(self._surface)
-	
-	def changeUiScale(self) -> None:
-		if self._uiObject:
-			self._uiScaled = renderer.uiScaleSurface(self._surface, self.uiScaleOffset)
-	
-	def changeSystemScale(self) -> None:
-		if self._systemObject:
-			self._systemScaled = renderer.systemScaleSurface(self._surface, self.systemScaleOffset)
+		s = self.getMapScaledSurface()
+		renderer.renderAtMap(s if s is not None else self._surface, at if self._offset is None else at + self._offset, fromPos, fromSize)
 	
 	def getSurface(self) -> Surface:
 		"""
@@ -85,20 +107,27 @@ class Texture:
 		"""
 		return self._surface
 	
-	def getMapScaledSurface(self) -> Surface:
+	def getMapScaledSurface(self) -> Surface | None:
 		"""
-		获取适应过地图缩放的pygame的Surface。除非必要，尽可能地不要修改Surface
+		获取适应过地图缩放的pygame的Surface，不适应地图缩放时为None。除非必要，尽可能地不要修改Surface：
+		缩放结果随时可能被丢弃重建，要设置透明色等请修改getSurface()，缩放结果会继承
 		"""
-		return self._mapScaled
+		if not self._mapObject:
+			return None
+		return scaledCache.get((self, 0, renderer.getMapScale()), self._mapVariant)
 	
 	def getUiScaledSurface(self) -> Surface:
 		"""
 		获取适应过UI缩放的pygame的Surface。除非必要，尽可能地不要修改Surface
 		"""
-		return self._uiScaled if self._uiObject else self._systemScaled
+		if not self._uiObject:
+			return self.getSystemScaledSurface()
+		return scaledCache.get((self, 1, renderer.getUiScale(), self.uiScaleOffset), self._uiVariant)
 	
-	def getSystemScaledSurface(self) -> Surface:
-		return self._systemScaled
+	def getSystemScaledSurface(self) -> Surface | None:
+		if not self._systemObject:
+			return None
+		return scaledCache.get((self, 2, renderer.getSystemScale(), self.systemScaleOffset), self._systemVariant)
 	
 	def setOffset(self, offset: Vector | None) -> None:
 		"""
@@ -111,30 +140,171 @@ class Texture:
 		return Vector() if self._offset is None else self._offset.clone()
 
 
+class ScaledCache:
+	"""
+	纹理缩放结果的LRU缓存，按占用的内存限制大小。键包含缩放倍数，缩放改变后用到哪个纹理才缩放哪个，
+	旧倍数的结果不再被用到，逐渐被挤出
+	"""
+	
+	def __init__(self, capacity: int = 128 << 20):
+		self.capacity: int = capacity
+		"""
+		占用内存上限（字节）
+		"""
+		self.size: int = 0
+		self.hits: int = 0
+		self.misses: int = 0
+		self._entries: OrderedDict[tuple, Surface] = OrderedDict()
+		self._lock: Lock = Lock()
+	
+	@staticmethod
+	def _bytes(surface: Surface) -> int:
+		return surface.get_width() * surface.get_height() * surface.get_bytesize()
+	
+	def get(self, key: tuple, build: Callable[[], Surface]) -> Surface:
+		"""
+		:param key: (纹理, 种类, 缩放...)
+		:param build: 没有缓存时生成
+		"""
+		with self._lock:
+			surface = self._entries.get(key)
+			if surface is not None:
+				self._entries.move_to_end(key)
+				self.hits += 1
+				return surface
+		surface = build()  # 不在锁内缩放，大图缩放较慢
+		with self._lock:
+			self.misses += 1
+			old = self._entries.get(key)
+			if old is not None:
+				return old
+			self._entries[key] = surface
+			self.size += self._bytes(surface)
+			while self.size > self.capacity and len(self._entries) > 1:
+				_, evicted = self._entries.popitem(last=False)
+				self.size -= self._bytes(evicted)
+		return surface
+	
+	def clear(self) -> None:
+		with self._lock:
+			self._entries.clear()
+			self.size = 0
+	
+	def describe(self) -> str:
+		return f"scaled {len(self._entries)} {self.size >> 20}MB {self.hits}/{self.misses}"
+
+
+scaledCache: ScaledCache = ScaledCache()
+
+
 class ResourceManager:
+	MANIFEST: str = "user/texture_manifest.json"
+	"""
+	上次运行用到的纹理列表。启动时据此在后台并行解码，模块导入时取用纹理只需等待解码完成
+	"""
+	
 	def __init__(self):
 		self._lock: Lock = Lock()
 		self._textures: dict[str, Texture] = {}
+		self._pending: dict[str, Future] = {}
+		self._executor: ThreadPoolExecutor | None = None
+		self._used: set[str] = set()
+		self._format: tuple | None = None  # 纹理当前转换成的屏幕像素格式，尚未转换时为None
 		try:
 			self._textures['no_texture'] = Texture('no_texture')
 		except FileNotFoundError:
 			raise FileNotFoundError("没有找到默认纹理")
 	
+	def preload(self, keys: Iterable[str]) -> None:
+		"""
+		在后台线程中解码纹理，不阻塞调用者。之后getOrNew这些纹理时直接取用解码结果
+		"""
+		with self._lock:
+			for key in keys:
+				if key in self._textures or key in self._pending:
+					continue
+				if self._executor is None:
+					self._executor = ThreadPoolExecutor(min(8, os.cpu_count() or 2), thread_name_prefix='TextureLoader')
+				self._pending[key] = self._executor.submit(Texture.load, key)
+	
+	def preloadManifest(self) -> None:
+		if not os.path.exists(self.MANIFEST):
+			return
+		try:
+			with open(self.MANIFEST, "r", encoding="utf-8") as f:
+				keys = json.load(f)
+			self.preload(k for k in keys if isinstance(k, str))
+		except Exception as e:
+			utils.printException(e)
+	
+	def writeManifest(self) -> None:
+		"""
+		退出时调用，记录本次用到的纹理供下次预加载
+		"""
+		try:
+			with open(self.MANIFEST, "w", encoding="utf-8") as f:
+				json.dump(sorted(self._used), f)
+		except Exception as e:
+			utils.printException(e)
+	
+	def endPreload(self) -> None:
+		"""
+		启动完成后调用，释放加载线程。还没有取用的预加载结果（清单中本次用不到的纹理）被丢弃，不再占用内存
+		"""
+		with self._lock:
+			executor, self._executor = self._executor, None
+			pending, self._pending = self._pending, {}
+		for future in pending.values():
+			future.cancel()
+		if executor is not None:
+			executor.shutdown(wait=False)
+		if len(pending) > 0:
+			utils.info(f"丢弃了{len(pending)}个没有用到的预加载纹理")
+	
+	def normalizeFormat(self) -> None:
+		"""
+		把所有纹理转换为屏幕的像素格式，并丢弃按旧格式生成的缩放结果和文字表面。
+		在主线程中于设置显示模式后调用；像素格式没有变化时什么也不做
+		"""
+		screen = pygame.display.get_surface()
+		if screen is None:
+			return
+		fmt = (screen.get_bitsize(), screen.get_masks())
+		if fmt == self._format:
+			return
+		with self._lock:
+			self._format = fmt
+			textures = set(self._textures.values())
+			for texture in textures:
+				texture.convert()
+		scaledCache.clear()
+		font.clearCache()
+		utils.info(f"已将{len(textures)}个纹理转换为{fmt[0]}位屏幕格式")
+	
 	def getOrNew(self, key: str):
 		if key in self._textures:
 			return self._textures[key]
-		try:
-			self._lock.acquire()
-			resource: Texture = Texture(key)
+		with self._lock:
+			if key in self._textures:
+				return self._textures[key]
+			future = self._pending.pop(key, None)
+			try:
+				with startupProfiler.measure('texture ' + key):
+					resource: Texture = Texture(key, future.result() if future is not None else None)
+				if self._format is not None:
+					resource.convert()
+			except FileNotFoundError:
+				self._textures[key] = self._textures['no_texture']
+				utils.error(f"没有找到纹理{key}，已经用默认纹理替代")
+				return self._textures[key]
+			except Exception as e:  # 文件损坏等，解码时的错误
+				utils.printException(e)
+				self._textures[key] = self._textures['no_texture']
+				utils.error(f"无法读取纹理{key}，已经用默认纹理替代")
+				return self._textures[key]
 			self._textures[key] = resource
-			resource.changeMapScale()
-			self._lock.release()
+			self._used.add(key)
 			return resource
-		except FileNotFoundError:
-			self._textures[key] = self._textures['no_texture']
-			utils.error(f"没有找到纹理{key}，已经用默认纹理替代")
-			self._lock.release()
-			return self._textures[key]
 	
 	def get(self, key: str) -> Texture:
 		if key not in self._textures:
@@ -149,32 +319,11 @@ class ResourceManager:
 			raise KeyError(f"资源{key}已存在")
 		else:
 			self._lock.acquire()
+			if self._format is not None:
+				resource.convert()
 			self._textures[key] = resource
-			resource.changeMapScale()
 			self._lock.release()
-	
-	def changeMapScale(self) -> None:
-		"""
-		仅在main.py, renderThread中调用
-		"""
-		self._lock.acquire()
-		for texture in self._textures.values():
-			texture.changeMapScale()
-		self._lock.release()
-	
-	def changeScale(self) -> None:
-		"""
-		仅在main.py, renderThread中调用
-		"""
-		self._lock.acquire()
-		for texture in self._textures.values():
-			if renderer.uiScaleChanged():
-				texture.changeUiScale()
-			if renderer.systemScaleChanged():
-				texture.changeSystemScale()
-			if renderer.mapScaleChanged():
-				texture.changeMapScale()
-		self._lock.release()
 
 
 resourceManager: ResourceManager = ResourceManager()
+resourceManager.preloadManifest()
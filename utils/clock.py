@@ -0,0 +1,94 @@
+"""
+游戏线程的固定步长时钟。tick按固定的时间表运行而不是“距离上一次够久了就运行”，落后时有限度地追赶，
+渲染线程的插值delta也从这里计算，两个线程用的是同一个时间基准。
+"""
+import time
+from typing import Callable
+
+from utils.util import utils
+
+
+class TickClock:
+	TICK: int = 44_000_000
+	"""
+	每tick的时长（纳秒）
+	"""
+	MAX_CATCH_UP: int = 5
+	"""
+	落后时一次最多连续补跑的tick数。再落后就直接丢弃，防止越追越慢
+	"""
+	
+	def __init__(self):
+		self._next: int = time.perf_counter_ns()
+		self.last: int = self._next
+		"""
+		最近一次tick的计划时间
+		"""
+		self.overrun: int = 0
+		"""
+		耗时超过一个tick的tick数
+		"""
+		self.caughtUp: int = 0
+		"""
+		补跑的tick数
+		"""
+		self.dropped: int = 0
+		"""
+		落后太多被丢弃的tick数
+		"""
+		self.worst: int = 0
+		"""
+		最近一秒内最慢的一次tick耗时（纳秒）
+		"""
+		self._worstCurrent: int = 0
+		self._worstReset: int = self._next
+	
+	def reset(self) -> None:
+		self._next = time.perf_counter_ns()
+		self.last = self._next
+	
+	def run(self, tick: Callable[[], None]) -> int:
+		"""
+		等到下一个tick的时间，然后运行到赶上时间表为止
+		:param tick: 每tick调用的函数
+		:return: 本次运行的tick数
+		"""
+		utils.sleepUntil(self._next)
+		count = 0
+		now = time.perf_counter_ns()
+		while now >= self._next and count < self.MAX_CATCH_UP:
+			self.last = self._next
+			tick()
+			self._next += self.TICK
+			end = time.perf_counter_ns()
+			cost = end - now
+			if cost > self.TICK:
+				self.overrun += 1
+			if cost > self._worstCurrent:
+				self._worstCurrent = cost
+			now = end
+			count += 1
+		if count > 1:
+			self.caughtUp += count - 1
+		if now >= self._next:
+			skipped = (now - self._next) // self.TICK + 1
+			self.dropped += skipped
+			self._next += skipped * self.TICK
+		if now - self._worstReset >= 1_000_000_000:
+			self.worst = self._worstCurrent
+			self._worstCurrent = 0
+			self._worstReset = now
+		return count
+	
+	def delta(self, now: int) -> float:
+		"""
+		:param now: time.perf_counter_ns()
+		:return: 距离最近一次tick经过了多少个tick，用于渲染插值
+		"""
+		return (now - self.last) / self.TICK
+	
+	def describe(self) -> str:
+		return f"tick max {self.worst / 1e6:.1f}ms over {self.overrun} +{self.caughtUp} -{self.dropped}"
+
+
+tickClock: TickClock = TickClock()
@@ -64,7 +64,10 @@ class Game:
 	def setWindow(self, window: Union['Window', None]) -> None:
 		interact.scroll.dealScroll()
 		interact.keys[pygame.K_ESCAPE].deals()
+		old = self._window.getNew()
 		self._window.set(window)
+		if old is not None and old is not window:
+			old.onClose()
 		if window is not None:
 			window.onResize()
 	
@@ -97,7 +100,8 @@ class Game:
 			# self.mouseAtMap = interact.mouse.clone().subtract(renderer.getCenter()).getVector().divide(renderer.getMapScale()).add(renderer.getCamera().get())  # 废弃代码段：移动至render触发计算
 			target1, target2 = None, None
 			targetDist1, targetDist2 = 1, 1
-			for e in (self._mainWorld.getEntities() + [self._mainWorld.getPlayer()]):
+			# 纹理偏移最多半格，所以多查一格范围再精确判断
+			for e in (self._mainWorld.queryRadius(self.mouseAtMap, 1.5) + [self._mainWorld.getPlayer()]):
 				if (dist := e.getPosition().add(e.getTexture().getOffset()).distanceManhattan(self.mouseAtMap)) < 0.5 and dist < targetDist2:
 					if dist < targetDist1:
 						target1, target2 = e, target1
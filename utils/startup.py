@@ -0,0 +1,189 @@
+"""
+启动分析。以`python main.py --profile-startup`启动时，记录每个模块的导入耗时、纹理加载、字体初始化，
+以及到StartWindow第一帧画出为止的时间。第一帧画出后写入user/startup_profile.json，
+以及可以直接交给flamegraph.pl或speedscope的折叠栈文件user/startup_profile.folded。
+必须在main.py中最先导入，之后导入的模块才会被记录。这里只能导入标准库和同样只依赖标准库的utils.util
+"""
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from importlib.abc import MetaPathFinder
+from threading import Lock, get_ident
+from typing import ContextManager
+
+from utils.util import utils
+
+
+class _Node:
+	def __init__(self, name: str):
+		self.name: str = name
+		self.total: int = 0
+		self.children: list['_Node'] = []
+	
+	def self(self) -> int:
+		return self.total - sum(c.total for c in self.children)
+	
+	def toJson(self) -> dict[str, any]:
+		return {
+			"name": self.name,
+			"total_ms": self.total / 1e6,
+			"self_ms": self.self() / 1e6,
+			"children": [c.toJson() for c in self.children],
+		}
+
+
+class _TimingLoader:
+	"""
+	包装真正的加载器，只在exec_module前后计时，其余属性原样转发
+	"""
+	
+	def __init__(self, loader, profiler: 'StartupProfiler'):
+		self._loader = loader
+		self._profiler: 'StartupProfiler' = profiler
+	
+	def __getattr__(self, item):
+		return getattr(self._loader, item)
+	
+	def create_module(self, spec):
+		return self._loader.create_module(spec)
+	
+	def exec_module(self, module) -> None:
+		with self._profiler.measure('import ' + module.__name__):
+			self._loader.exec_module(module)
+
+
+class _TimingFinder(MetaPathFinder):
+	def __init__(self, profiler: 'StartupProfiler'):
+		self._profiler: 'StartupProfiler' = profiler
+	
+	def find_spec(self, fullname, path, target=None):
+		for finder in sys.meta_path:
+			if finder is self or not hasattr(finder, 'find_spec'):
+				continue
+			spec = finder.find_spec(fullname, path, target)
+			if spec is None:
+				continue
+			if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+				spec.loader = _TimingLoader(spec.loader, self._profiler)
+			return spec
+		return None
+
+
+class StartupProfiler:
+	"""
+	主线程中的计时按嵌套关系组成树，其他线程中的计时（例如并行加载纹理）只按名称累计
+	"""
+	
+	def __init__(self, path: str = "user/startup_profile"):
+		self.enabled: bool = '--profile-startup' in sys.argv
+		self.path: str = path
+		self._start: int = time.perf_counter_ns()
+		self._thread: int = get_ident()
+		self._lock: Lock = Lock()
+		self._root: _Node = _Node('startup')
+		self._stack: list[tuple[_Node, int]] = [(self._root, self._start)]
+		self._threads: dict[str, int] = {}
+		self._marks: dict[str, float] = {}
+		self._finder: _TimingFinder | None = None
+		if self.enabled:
+			self._finder = _TimingFinder(self)
+			sys.meta_path.insert(0, self._finder)
+	
+	def measure(self, name: str) -> ContextManager:
+		"""
+		计时一段代码。没有开启分析时什么也不做
+		"""
+		return self._measure(name) if self.enabled else nullcontext()
+	
+	@contextmanager
+	def _measure(self, name: str):
+		start = time.perf_counter_ns()
+		if get_ident() != self._thread:
+			try:
+				yield
+			finally:
+				with self._lock:
+					self._threads[name] = self._threads.get(name, 0) + time.perf_counter_ns() - start
+			return
+		with self._lock:
+			node = _Node(name)
+			self._stack[-1][0].children.append(node)
+			self._stack.append((node, start))
+		try:
+			yield
+		finally:
+			with self._lock:
+				node.total = time.perf_counter_ns() - start
+				self._stack.pop()
+	
+	def mark(self, name: str) -> None:
+		"""
+		记录某个阶段完成的时刻
+		"""
+		if self.enabled:
+			self._marks[name] = (time.perf_counter_ns() - self._start) / 1e6
+	
+	def finish(self) -> None:
+		"""
+		第一帧画出后调用，写出报告。只会写一次
+		"""
+		if not self.enabled:
+			return
+		self.enabled = False
+		self.mark('first frame')
+		with self._lock:
+			if self._finder in sys.meta_path:
+				sys.meta_path.remove(self._finder)
+			self._root.total = time.perf_counter_ns() - self._start
+			for node, start in self._stack[1:]:  # 还没有结束的部分按现在结束计算
+				node.total = time.perf_counter_ns() - start
+			report = {
+				"total_ms": self._root.total / 1e6,
+				"marks_ms": self._marks,
+				"summary_ms": self._summary(),
+				"other_threads_ms": {k: v / 1e6 for k, v in self._threads.items()},
+				"tree": self._root.toJson(),
+			}
+			folded: list[str] = []
+			self._fold(self._root, '', folded)
+		try:
+			directory = os.path.dirname(self.path)
+			if directory and not os.path.exists(directory):
+				os.makedirs(directory)
+			with open(self.path + ".json", "w", encoding="utf-8") as f:
+				json.dump(report, f, ensure_ascii=False, indent=1)
+			with open(self.path + ".folded", "w", encoding="utf-8") as f:
+				f.write('\n'.join(folded))
+			utils.info(f"启动用时{report['total_ms']:.0f}ms，分析报告已写入{self.path}.json和{self.path}.folded")
+		except OSError as e:
+			utils.warn(f"无法写入启动分析报告：{e}")
+	
+	def _summary(self) -> dict[str, float]:
+		"""
+		按类别（import、texture、font等，名称的第一个词）累计自身耗时
+		"""
+		ret: dict[str, float] = {}
+		stack = [self._root]
+		while stack:
+			node = stack.pop()
+			kind = node.name.split(' ', 1)[0]
+			ret[kind] = ret.get(kind, 0) + node.self() / 1e6
+			stack.extend(node.children)
+		return ret
+	
+	@staticmethod
+	def _fold(node: _Node, prefix: str, out: list[str]) -> None:
+		"""
+		折叠栈格式：每行“根;子;孙 自身耗时（微秒）”
+		"""
+		name = prefix + node.name.replace(';', ':')
+		value = node.self() // 1000
+		if value > 0:
+			out.append(f"{name} {value}")
+		for c in node.children:
+			StartupProfiler._fold(c, name + ';', out)
+
+
+startupProfiler: StartupProfiler = StartupProfiler()
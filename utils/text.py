@@ -1,3 +1,6 @@
+import string as _string
+from collections import OrderedDict
+from threading import Lock
 from typing import TYPE_CHECKING, Union
 
 from pygame import Surface
@@ -10,6 +13,13 @@ if TYPE_CHECKING:
 	from entity.entity import Entity
 	from entity.skill import Skill
 
+parseCacheCapacity: int = 1024
+"""
+解析缓存的容量。相同的字符串只解析一次，超出容量时淘汰最久未用的
+"""
+_parseCache: OrderedDict[str, tuple['InnerStringConfig', ...]] = OrderedDict()
+_parseLock: Lock = Lock()
+
 
 class Description:
 	"""
@@ -29,7 +39,7 @@ class BlockDescription(Description):
 		self._block = block
 	
 	def generate(self) -> list['RenderableString']:
-		return [RenderableString('\\#ffaa4499' + self._block.getBlockPosition().getTuple().__str__())] + self.d
+		return [_blockPositionTemplate.format(self._block.getBlockPosition().getTuple())] + self.d
 
 
 class EntityDescription(Description):
@@ -42,9 +52,14 @@ class EntityDescription(Description):
 		if isinstance(self._entity, Damageable):
 			from entity.entity import Entity
 			assert isinstance(self._entity, Entity) and isinstance(self._entity, Damageable)
-			return [RenderableString('\\#ffaa4499' + self._entity.getPosition().toString() + (f'\\#ffee0000 UUID -1' if self._entity.uuid == -1 else f'\\#ffeeee00 UUID {self._entity.uuid}')), RenderableString(f'\\#ffee4444HP {self._entity.getHealth():.2f}/{self._entity.getMaxHealth():.2f}')] + self.d
+			return [self._header(), _entityHealthTemplate.format(self._entity.getHealth(), self._entity.getMaxHealth())] + self.d
 		else:
-			return [RenderableString('\\#ffaa4499' + self._entity.getPosition().toString() + (f'\\#ffee0000 UUID -1' if self._entity.uuid == -1 else f'\\#ffeeee00 UUID {self._entity.uuid}'))] + self.d
+			return [self._header()] + self.d
+	
+	def _header(self) -> 'RenderableString':
+		if self._entity.uuid == -1:
+			return _entityHeaderNoUuidTemplate.format(self._entity.getPosition().toString())
+		return _entityHeaderTemplate.format(self._entity.getPosition().toString(), self._entity.uuid)
 
 
 class SkillDescription(Description):
@@ -55,9 +70,9 @@ class SkillDescription(Description):
 	def generate(self) -> list['RenderableString']:
 		from entity.active_skill import Active
 		if isinstance(self._skill, Active):
-			return [RenderableString(f'\\#ffaa4499主动技能 {"就绪" if self._skill.getCoolDown() == 0 else (self._skill.getCoolDown() / 20)}/{int(self._skill.getMaxCoolDown() / 20)}秒')] + self.d
+			return [_activeSkillTemplate.format("就绪" if self._skill.getCoolDown() == 0 else (self._skill.getCoolDown() / 20), int(self._skill.getMaxCoolDown() / 20))] + self.d
 		else:
-			return [RenderableString(f'\\#ffaa4499被动技能 {"就绪" if self._skill.getCoolDown() == 0 else int(self._skill.getCoolDown() / 20) + 1}/{int(self._skill.getMaxCoolDown() / 20)}秒' if self._skill.getMaxCoolDown() != 0 else '\\#ffaa4499被动技能')] + self.d
+			return [_passiveSkillTemplate.format("就绪" if self._skill.getCoolDown() == 0 else int(self._skill.getCoolDown() / 20) + 1, int(self._skill.getMaxCoolDown() / 20)) if self._skill.getMaxCoolDown() != 0 else RenderableString('\\#ffaa4499被动技能')] + self.d
 
 
 class InnerStringConfig:
@@ -156,6 +171,26 @@ class RenderableString:
 		self._parseAppend(string)
 	
 	def _parseAppend(self, string: str) -> None:
+		"""
+		从空字符串开始解析时使用缓存。解析结果的各段在之后不会被修改，所以可以在多个RenderableString之间共享
+		"""
+		if len(self.set) != 0:
+			self._parse(string)
+			return
+		with _parseLock:
+			cached = _parseCache.get(string)
+			if cached is not None:
+				_parseCache.move_to_end(string)
+		if cached is not None:
+			self.set = list(cached)
+			return
+		self._parse(string)
+		with _parseLock:
+			_parseCache[string] = tuple(self.set)
+			while len(_parseCache) > parseCacheCapacity:
+				_parseCache.popitem(False)
+	
+	def _parse(self, string: str) -> None:
 		config = InnerStringConfig() if len(self.set) == 0 else self.set[-1].clone()
 		subs = string.split('\\')
 		if len(subs) == 0:
@@ -286,6 +321,40 @@ class RenderableString:
 		return '\n'.join([str(i) for i in self.set])
 
 
+class StringTemplate:
+	"""
+	带有format占位符的RenderableString模板，用于只有数字等少量内容变化的文字，例如血量、坐标、冷却。
+	转义序列只在创建时解析一次，format时只替换各段文字中的占位符。填入的内容不会被当作转义序列
+	"""
+	
+	def __init__(self, markup: str):
+		"""
+		:param markup: 与RenderableString相同的格式，另外可以包含str.format的占位符。占位符中不能出现反斜线
+		"""
+		numbered = []
+		index = 0
+		for literal, field, spec, conversion in _string.Formatter().parse(markup):
+			numbered.append(literal.replace('{', '{{').replace('}', '}}'))
+			if field is None:
+				continue
+			if field == '':
+				field = str(index)
+				index += 1
+			numbered.append('{' + field + ('!' + conversion if conversion else '') + (':' + spec if spec else '') + '}')
+		self._segments: tuple[InnerStringConfig, ...] = tuple(RenderableString(''.join(numbered)).set)
+		self._dynamic: tuple[bool, ...] = tuple('{' in seg.string or '}' in seg.string for seg in self._segments)
+	
+	def format(self, *args, **kwargs) -> RenderableString:
+		ret = RenderableString('')
+		for seg, dynamic in zip(self._segments, self._dynamic):
+			if dynamic:
+				formatted = seg.clone()
+				formatted.string = seg.string.format(*args, **kwargs)
+				seg = formatted
+			ret.set.append(seg)
+		return ret
+
+
 def toRomanNumeral(value: int) -> str:
 	if value == 0:
 		return "N"
@@ -363,3 +432,11 @@ def toRomanNumeral(value: int) -> str:
 		else:
 			ret += "IX"
 	return ret
+
+
+_blockPositionTemplate: StringTemplate = StringTemplate('\\#ffaa4499{}')
+_entityHeaderTemplate: StringTemplate = StringTemplate('\\#ffaa4499{}\\#ffeeee00 UUID {}')
+_entityHeaderNoUuidTemplate: StringTemplate = StringTemplate('\\#ffaa4499{}\\#ffee0000 UUID -1')
+_entityHealthTemplate: StringTemplate = StringTemplate('\\#ffee4444HP {:.2f}/{:.2f}')
+_activeSkillTemplate: StringTemplate = StringTemplate('\\#ffaa4499主动技能 {}/{}秒')
+_passiveSkillTemplate: StringTemplate = StringTemplate('\\#ffaa4499被动技能 {}/{}秒')
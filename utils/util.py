@@ -156,6 +156,18 @@ class Utils:
 			return end
 		else:
 			return value
+	
+	@staticmethod
+	def sleepUntil(deadline: int) -> None:
+		"""
+		睡到time.perf_counter_ns()到达deadline。大部分时间真正睡眠，最后1ms让出时间片等待，兼顾精度和CPU占用
+		:param deadline: 纳秒
+		"""
+		remaining = deadline - time.perf_counter_ns()
+		if remaining > 2_000_000:
+			time.sleep((remaining - 1_000_000) / 1e9)
+		while time.perf_counter_ns() < deadline:
+			time.sleep(0)
 
 
 utils: Utils = Utils()
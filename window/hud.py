@@ -41,17 +41,17 @@ class Hud(Renderable):
 		barLength = int(w * self.defaultLength)
 		sw, sh = (barLength + barLeft, margin * 3)
 		barHeight = margin
-		surface: Surface = Surface((sw, sh))
-		surface.set_colorkey((0, 0, 0))
-		surface.set_alpha(0xcc)
+		content = (sw, sh, barLeft, self.displayHealth, self.lastDisplayHealth, self.displayHunger, self.lastDisplayHunger)  # 决定血条画面的值，画的过程中last*会被更新
+		surface: Surface = renderer.getOverlay((sw, sh), 0xcc, (0, 0, 0))
+		surface.fill((0, 0, 0))
 		pygame.draw.polygon(surface, (0xff, 0xff, 0xff), [(0, 0), (sw, 0), (sw - (sh >> 1), sh), (0, sh)])
 		barBackgroundX = (barHeight - 1)
 		up = sw - barBackgroundX - (barHeight >> 1)
 		down = sw - barBackgroundX - barHeight
 		pygame.draw.polygon(surface, (1, 1, 1), [(barLeft - 1, barBackgroundX), (up, barBackgroundX), (down, subBarY := (sh - barBackgroundX)), (barLeft - 1, subBarY)])  # 背景黑条
-		renderer.getCanvas().blit(surface, (margin, margin))
+		renderer.blit(surface, (margin, margin), content[:3])
+		surface = renderer.getOverlay((sw, sh), 0xff, (0, 0, 0))
 		surface.fill((0, 0, 0))
-		surface.set_alpha(0xff)
 		up -= 1 + barLeft
 		down -= 1 + barLeft
 		
@@ -132,7 +132,7 @@ class Hud(Renderable):
 				self.lastDisplayHunger = self.displayHunger
 			else:
 				self.lastDisplayHunger -= 0.002 + valueDelta * 0.01
-		renderer.getCanvas().blit(surface, (margin, margin))
+		renderer.blit(surface, (margin, margin), content)
 		
 		renderer.renderString(RenderableString('\\11' + player.name), margin << 1, margin + (sh >> 1), 0xff000000, Location.LEFT)
 		
@@ -1,5 +1,4 @@
 import pygame
-from pygame import Surface
 
 from interact.interacts import interact
 from music.music import Music_player
@@ -99,8 +98,8 @@ class StatusWindow(Window):
 		s = self.skillSelecting
 		if s is not None:
 			sfc = s[0].texture.getSystemScaledSurface()
-			renderer.getCanvas().blit(sfc, (renderer.getSize().x * 0.85 - (sfc.get_width() >> 1), sfc.get_height()))
-			renderer.getCanvas().blit(sfc, (renderer.getSize().x * 0.85 - (sfc.get_width() >> 1), sfc.get_height()))
+			renderer.blit(sfc, (renderer.getSize().x * 0.85 - (sfc.get_width() >> 1), sfc.get_height()))
+			renderer.blit(sfc, (renderer.getSize().x * 0.85 - (sfc.get_width() >> 1), sfc.get_height()))
 			
 			renderer.renderString(s[0].getName(), int(size.x * 0.85), y := int(size.y * 0.4), 0xffeeee55, Location.TOP, 0, 1)
 			y += font.realFontHeight
@@ -239,10 +238,8 @@ class TaskWindow(Window):
 		renderer.renderString(RenderableString('\\.ffEFE4B0\\10左侧点击选择任务，Tab键返回'), int((0.58 if renderer.is4to3.get() else 0.56) * size.x), int(size.y * 0.8), 0xff000000, Location.BOTTOM)
 	
 	def passRender(self, delta: float, at: Vector | None = None) -> None:
-		s = Surface(renderer.getCanvas().get_size())
-		s.fill(self.backgroundColor & 0xffffff)
-		s.set_alpha(self.backgroundColor >> 24)
-		renderer.getCanvas().blit(s, (0, 0))
+		w, h = renderer.getSize().getTuple()
+		renderer.fill(self.backgroundColor, 0, 0, w, h)
 		super().passRender(delta, at)
 	
 	def tick(self) -> None:
@@ -431,10 +428,8 @@ class BuildingWindow(Window):
 		renderer.renderString(RenderableString("\\00\\00小鸡正在织鸡窝…………"), int(0.5 * w), int(0.7 * h), 0xffffffff, Location.CENTER)
 	
 	def passRender(self, delta: float, at: Vector | None = None) -> None:
-		s = Surface(renderer.getCanvas().get_size())
-		s.fill(self.backgroundColor & 0xffffff)
-		s.set_alpha(self.backgroundColor >> 24)
-		renderer.getCanvas().blit(s, (0, 0))
+		w, h = renderer.getSize().getTuple()
+		renderer.fill(self.backgroundColor, 0, 0, w, h)
 		super().passRender(delta, at)
 	
 	def tick(self) -> None:
@@ -704,7 +699,7 @@ class GuidanceWindow(Window):
 	def renderBackground(self, delta: float, at: BlockVector = BlockVector()) -> None:
 		page = self.page
 		if self._texture[page] is not None:
-			w, h = renderer.getCanvas().get_size()
+			w, h = renderer.getSize().getTuple()
 			texture_num = len(self._texture[page])
 			for i in range(texture_num):
 				size: BlockVector = renderer.getSize()
@@ -714,15 +709,8 @@ class GuidanceWindow(Window):
 				pic.renderAtInterface(pos)
 		
 		else:
-			head = self.backgroundColor & 0xff000000
-			if head == 0:
-				renderer.getCanvas().fill(0)
-			else:
-				color = self.backgroundColor & 0xffffff
-				s = Surface(renderer.getCanvas().get_size())
-				s.fill(color)
-				s.set_alpha(head >> 24)
-				renderer.getCanvas().blit(s, (0, 0))
+			w, h = renderer.getSize().getTuple()
+			renderer.fill(0xff000000 if self.backgroundColor & 0xff000000 == 0 else self.backgroundColor, 0, 0, w, h)
 	
 	def render(self, delta: float) -> None:
 		page = self.page
@@ -734,10 +722,8 @@ class GuidanceWindow(Window):
 			renderer.renderString(RenderableString(f'\\.0040304D\\00{self._text[page][i]}'), int(size.x * self._text_position[page][i][0]), int(size.y * self._text_position[page][i][1]), 0xffffffff, Location.CENTER)
 	
 	def passRender(self, delta: float, at: Vector | None = None) -> None:
-		s = Surface(renderer.getCanvas().get_size())
-		s.fill(self.backgroundColor & 0x000000)
-		
-		renderer.getCanvas().blit(s, (0, 0))
+		w, h = renderer.getSize().getTuple()
+		renderer.fill(0xff000000, 0, 0, w, h)
 		super().passRender(delta, at)
 
 
@@ -1,6 +1,7 @@
 import asyncio
 import os
 import time
+from concurrent.futures import Future
 
 import pygame.event
 from pygame import Surface
@@ -18,9 +19,8 @@ from LLA import chat_with_ai as ai
 from utils.text import font as _f
 
 aiHistory: list = []
-asyncAiTask = None
+asyncAiTask: Future | None = None
 asyncTasks = asyncio.get_event_loop()  # 必须必须在main中最后关闭
-asyncTasks.create_task(ai.getWords())
 
 
 def adaptText(text: str, width: int, font: Font) -> list[str]:
@@ -87,17 +87,33 @@ def adaptText(text: str, width: int, font: Font) -> list[str]:
 
 
 async def adaptAiReply(txt: str, aiHistory: list, window: 'AiWindow') -> None:
-	res = await ai.send(txt)
+	"""
+	流式接收回复，每收到一段就重新排版当前段落，前面已经换行的段落不再改动
+	"""
 	from render import font
-	lis = adaptText(res['content'], int(0.7 * renderer.getCanvas().get_width()), font.allFonts[10])
-	autoScroll = False
-	if window.rendering - len(aiHistory) < 2:
-		autoScroll = True
-	aiHistory.append(RenderableString('\\10\\#ffee44cc' + res['role']))
-	aiHistory.extend(lis)
-	await asyncio.sleep(0.1)
-	if autoScroll:
-		window.rendering = len(aiHistory)
+	width = int(0.7 * renderer.getSize().x)
+	
+	def show(lines: list) -> None:
+		following = window.rendering >= len(aiHistory) - 1  # 正停在最底部时跟随新内容滚动
+		aiHistory[start:] = lines
+		if following:
+			window.rendering = len(aiHistory)
+	
+	start = len(aiHistory)  # 当前段落的第一行在aiHistory中的位置
+	show([RenderableString('\\10\\#ffee44ccassistant')])
+	start = len(aiHistory)
+	paragraph = ''  # 当前段落（最后一个换行之后）的原文
+	try:
+		async for piece in ai.sendStream(txt):
+			*finished, paragraph = (paragraph + piece).split('\n')
+			for p in finished:
+				show(adaptText(p, width, font.allFonts[10]))
+				start = len(aiHistory)
+			show(adaptText(paragraph, width, font.allFonts[10]))
+	except Exception as e:  # 超时、连接失败等。取消（CancelledError）不在此列
+		utils.printException(e)
+		start = len(aiHistory)
+		show(adaptText('AI暂时没有回应，请稍后再试', width, font.allFonts[10]))
 
 
 class InputWidget(Widget):
@@ -260,16 +276,8 @@ class InputWidget(Widget):
 	
 	def render(self, delta: float) -> None:
 		colorSelector = self.color.inactive if not self.active else self.color.active
-		head = colorSelector & 0xff000000
-		colorSelector -= head
-		colorSelector = ((colorSelector >> 16) & 0xff, (colorSelector >> 8) & 0xff, colorSelector & 0xff)
-		if head == 0xff000000:
-			renderer.getCanvas().fill(colorSelector, (self._x, self._y, self._w, self._h))
-		elif head != 0:
-			s = Surface((self._w, self._h))
-			s.fill(colorSelector)
-			s.set_alpha(head >> 24)
-			renderer.getCanvas().blit(s, (self._x, self._y))
+		if colorSelector & 0xff000000 != 0:
+			renderer.fill(colorSelector, self._x, self._y, self._w, self._h)
 		text = self._realText if self._displayText is None else self._displayText
 		texts = []
 		font = _f.allFonts[10].get(False, False, False, False)
@@ -294,7 +302,7 @@ class InputWidget(Widget):
 			rect = (self._x + offset.x, offset.y + self._y, 0, 0)
 			pygame.key.set_text_input_rect(rect)
 			if self.caretBlinkTime > 0:
-				renderer.getCanvas().blit(font.render('  ', True, ((self.textColor.active >> 16) & 0xff ^ 0xff, (self.textColor.active >> 8) & 0xff ^ 0xff, self.textColor.active & 0xff ^ 0xff), ((self.color.active >> 16) & 0xff ^ 0xff, (self.color.active >> 8) & 0xff ^ 0xff, self.color.active & 0xff ^ 0xff)), (self._x, self._y))
+				renderer.blit(font.render('  ', True, ((self.textColor.active >> 16) & 0xff ^ 0xff, (self.textColor.active >> 8) & 0xff ^ 0xff, self.textColor.active & 0xff ^ 0xff), ((self.color.active >> 16) & 0xff ^ 0xff, (self.color.active >> 8) & 0xff ^ 0xff, self.color.active & 0xff ^ 0xff)), (self._x, self._y))
 		else:
 			y0 = 0
 			cc = self.caret + self._caretOffset
@@ -315,7 +323,7 @@ class InputWidget(Widget):
 					else:
 						sfc.blit(font.render(i[cc] if cc < len(i) else '  ', True, ((self.textColor.active >> 16) & 0xff ^ 0xff, (self.textColor.active >> 8) & 0xff ^ 0xff, self.textColor.active & 0xff ^ 0xff), ((self.color.active >> 16) & 0xff ^ 0xff, (self.color.active >> 8) & 0xff ^ 0xff, self.color.active & 0xff ^ 0xff)), (font.size(i[:cc])[0], y0))
 				y0 += _f.realHalfHeight
-			renderer.getCanvas().blit(sfc, (self._x, self._y))
+			renderer.blit(sfc, (self._x, self._y))
 	
 	def catch(self, val: bool = True) -> None:
 		self._inputting = val
@@ -379,17 +387,29 @@ class InputWindow(Window):
 
 
 class AiWindow(InputWindow):
+	startingNotice: RenderableString = RenderableString("\\#ffeeee00AI助手正在启动……")
+	failedNotice: RenderableString = RenderableString("\\#ffee4400AI助手无法启动，只能使用离线内容")
 	
 	def __init__(self):
 		super().__init__('ai')
+		if len(aiHistory) == 0:  # 恢复上次保存的对话
+			width = int(0.7 * renderer.getSize().x)
+			for q, a in ai.history.turns():
+				aiHistory.append(RenderableString('\\10\\#ffeeee00YOU'))
+				aiHistory.extend(adaptText(q['content'], width, font.allFonts[10]))
+				aiHistory.append(RenderableString('\\10\\#ffee44cc' + a['role']))
+				aiHistory.extend(adaptText(a['content'], width, font.allFonts[10]))
 		self.rendering: int = len(aiHistory)
 		self.canRender: int = 0
+		ai.warmUp()
 	
 	def tick(self) -> None:
 		global aiHistory
-		global asyncTasks
 		global asyncAiTask
 		if interact.keys[pygame.K_ESCAPE].deals():
+			if asyncAiTask is not None:
+				asyncAiTask.cancel()  # 关闭窗口时放弃还没收到的回复
+				asyncAiTask = None
 			game.setWindow(self.lastOpen)
 		if interact.specialKeys[pygame.K_KP_ENTER & interact.KEY_COUNT].deals() or interact.keys[pygame.K_RETURN & interact.KEY_COUNT].deals():
 			if asyncAiTask is None or asyncAiTask.done():
@@ -399,8 +419,8 @@ class AiWindow(InputWindow):
 					if self.rendering - len(aiHistory) < 2:
 						autoScroll = True
 					from render import font
-					aiHistory = aiHistory + [RenderableString('\\10\\#ffeeee00YOU')] + adaptText(txt, int(0.7 * renderer.getCanvas().get_width()), font.allFonts[10])
-					asyncAiTask = asyncTasks.create_task(adaptAiReply(txt, aiHistory, self))
+					aiHistory = aiHistory + [RenderableString('\\10\\#ffeeee00YOU')] + adaptText(txt, int(0.7 * renderer.getSize().x), font.allFonts[10])
+					asyncAiTask = ai.runAsync(adaptAiReply(txt, aiHistory, self))
 					if autoScroll:
 						self.rendering = len(aiHistory)
 		scr = interact.scroll.dealScroll()
@@ -413,23 +433,27 @@ class AiWindow(InputWindow):
 	
 	def render(self, delta: float) -> None:
 		super().render(delta)
+		if ai.state == ai.AiState.STARTING:
+			renderer.renderString(self.startingNotice, renderer.getSize().x >> 1, renderer.getSize().y >> 4, 0xffffffff, Location.TOP)
+		elif ai.state == ai.AiState.FAILED:
+			renderer.renderString(self.failedNotice, renderer.getSize().x >> 1, renderer.getSize().y >> 4, 0xffffffff, Location.TOP)
 		from render import font
-		h = int(0.6 * renderer.getCanvas().get_height())
+		h = int(0.6 * renderer.getSize().y)
 		self.canRender: int = h // font.realHalfHeight
-		x0 = int(0.1 * renderer.getCanvas().get_width())
-		x1 = int(0.15 * renderer.getCanvas().get_width())
-		y0 = int(0.7 * renderer.getCanvas().get_height())
+		x0 = int(0.1 * renderer.getSize().x)
+		x1 = int(0.15 * renderer.getSize().x)
+		y0 = int(0.7 * renderer.getSize().y)
 		if self.rendering >= (lenHistory := len(aiHistory)):
 			self.rendering = lenHistory
 		for i in range(self.rendering - 1, max(self.rendering - self.canRender, 0) - 1, -1):
 			y0 -= font.realHalfHeight
 			text = aiHistory[i]
 			if isinstance(text, RenderableString):
-				text.renderAt(renderer.getCanvas(), x0, y0, 0xffffffff, 0)
+				renderer.renderString(text, x0, y0, 0xffffffff)
 			else:
 				sfc = font.allFonts[10].get(False, False, False, False).render(text, True, 0xffffffff, 0)
 				sfc.set_colorkey((0, 0, 0))
-				renderer.getCanvas().blit(sfc, (x1, y0))
+				renderer.blit(sfc, (x1, y0), text)
 
 
 class _SeedWindow:
@@ -493,7 +517,7 @@ class SeedWindow(InputWindow):
 
 	def render(self, delta: float) -> None:
 		super().render(delta)
-		w, h = renderer.getCanvas().get_size()
+		w, h = renderer.getSize().getTuple()
 		renderer.renderString(self._info, w >> 1, h >> 3, 0xffffffff, Location.TOP)
 		renderer.renderString(RenderableString("Seed "), int(w * 0.2), int(h * 0.4), 0xffffffff, Location.RIGHT)
 		renderer.renderString(RenderableString("Name "), int(w * 0.2), int(h * 0.5), 0xffffffff, Location.RIGHT)
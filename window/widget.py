@@ -1,6 +1,5 @@
 from typing import Callable
 
-from pygame import Surface
 
 from render.renderable import Renderable
 from render.renderer import renderer, Location
@@ -87,16 +86,8 @@ class Widget(Renderable):
 			self._texture.renderAtInterface(BlockVector(self._x, self._y))
 		else:
 			colorSelector = self.color.inactive if not self.active else self.color.active if not self._isMouseIn else self.color.hovering
-			head = colorSelector & 0xff000000
-			colorSelector -= head
-			colorSelector = ((colorSelector >> 16) & 0xff, (colorSelector >> 8) & 0xff, colorSelector & 0xff)
-			if head == 0xff000000:
-				renderer.getCanvas().fill(colorSelector, (self._x, self._y, self._w, self._h))
-			elif head != 0:
-				s = Surface((self._w, self._h))
-				s.fill(colorSelector)
-				s.set_alpha(head >> 24)
-				renderer.getCanvas().blit(s, (self._x, self._y))
+			if colorSelector & 0xff000000 != 0:
+				renderer.fill(colorSelector, self._x, self._y, self._w, self._h)
 		match self.textLocation:
 			case Location.LEFT_TOP:
 				renderer.renderString(self.name, self._x, self._y, self.textColor.inactive if not self.active else self.textColor.active if not self._isMouseIn else self.textColor.hovering, Location.LEFT_TOP, self.color.inactive if not self.active else self.color.active if not self._isMouseIn else self.color.hovering)
@@ -222,25 +213,10 @@ class Slider(Widget):
 		else:
 			colorSelector = self.color.inactive if not self.active else self.color.active if not self._isMouseIn else self.color.hovering
 			colorReversed = self.barColor.inactive if not self.active else self.barColor.active if not self._isMouseIn else self.barColor.hovering
-			head = colorSelector & 0xff000000
-			head2 = colorReversed & 0xff000000
-			colorSelector -= head
-			colorSelector = ((colorSelector >> 16) & 0xff, (colorSelector >> 8) & 0xff, colorSelector & 0xff)
-			colorReversed = ((colorReversed >> 16) & 0xff, (colorReversed >> 8) & 0xff, colorReversed & 0xff)
-			if head == 0xff000000:
-				renderer.getCanvas().fill(colorSelector, (self._x, self._y, self._w, self._h))
-			elif head != 0:
-				s = Surface((self._w, self._h))
-				s.fill(colorSelector)
-				s.set_alpha(head >> 24)
-				renderer.getCanvas().blit(s, (self._x, self._y))
-			if head2 == 0xff000000:
-				renderer.getCanvas().fill(colorReversed, (self._x, self._y, self._w * self.value, self._h))
-			elif head2 != 0:
-				s = Surface((self._w * self.value, self._h))
-				s.fill(colorReversed)
-				s.set_alpha(head2 >> 24)
-				renderer.getCanvas().blit(s, (self._x, self._y))
+			if colorSelector & 0xff000000 != 0:
+				renderer.fill(colorSelector, self._x, self._y, self._w, self._h)
+			if colorReversed & 0xff000000 != 0:
+				renderer.fill(colorReversed, self._x, self._y, int(self._w * self.value), self._h)
 		name = self.name.clone().append(f'\\01: {self.value * 100:.2f}%')
 		match self.textLocation:
 			case Location.LEFT_TOP:
@@ -287,32 +263,32 @@ class PullObject(Widget):
 			self._y = y - self.offset.y
 			match self.location:
 				case Location.LEFT_TOP:
-					self.x = self._x / renderer.getCanvas().get_width()
-					self.y = self._y / renderer.getCanvas().get_height()
+					self.x = self._x / renderer.getSize().x
+					self.y = self._y / renderer.getSize().y
 				case Location.LEFT:
-					self.x = self._x / renderer.getCanvas().get_width()
-					self.y = (self._y - (renderer.getSize().y - self._h >> 1)) / renderer.getCanvas().get_height()
+					self.x = self._x / renderer.getSize().x
+					self.y = (self._y - (renderer.getSize().y - self._h >> 1)) / renderer.getSize().y
 				case Location.LEFT_BOTTOM:
-					self.x = self._x / renderer.getCanvas().get_width()
-					self.y = (self._y - (renderer.getSize().y - self._h)) / renderer.getCanvas().get_height()
+					self.x = self._x / renderer.getSize().x
+					self.y = (self._y - (renderer.getSize().y - self._h)) / renderer.getSize().y
 				case Location.TOP:
-					self.x = (self._x - (renderer.getSize().x - self._w >> 1)) / renderer.getCanvas().get_width()
-					self.y = self._y / renderer.getCanvas().get_height()
+					self.x = (self._x - (renderer.getSize().x - self._w >> 1)) / renderer.getSize().x
+					self.y = self._y / renderer.getSize().y
 				case Location.CENTER:
-					self.x = (self._x - (renderer.getSize().x - self._w >> 1)) / renderer.getCanvas().get_width()
-					self.y = (self._y - (renderer.getSize().y - self._h >> 1)) / renderer.getCanvas().get_height()
+					self.x = (self._x - (renderer.getSize().x - self._w >> 1)) / renderer.getSize().x
+					self.y = (self._y - (renderer.getSize().y - self._h >> 1)) / renderer.getSize().y
 				case Location.BOTTOM:
-					self.x = (self._x - (renderer.getSize().x - self._w >> 1)) / renderer.getCanvas().get_width()
-					self.y = (self._y - (renderer.getSize().y - self._h)) / renderer.getCanvas().get_height()
+					self.x = (self._x - (renderer.getSize().x - self._w >> 1)) / renderer.getSize().x
+					self.y = (self._y - (renderer.getSize().y - self._h)) / renderer.getSize().y
 				case Location.RIGHT_TOP:
-					self.x = (self._x - (renderer.getSize().x - self._w)) / renderer.getCanvas().get_width()
-					self.y = self._y / renderer.getCanvas().get_height()
+					self.x = (self._x - (renderer.getSize().x - self._w)) / renderer.getSize().x
+					self.y = self._y / renderer.getSize().y
 				case Location.RIGHT:
-					self.x = (self._x - (renderer.getSize().x - self._w)) / renderer.getCanvas().get_width()
-					self.y = (self._y - (renderer.getSize().y - self._h >> 1)) / renderer.getCanvas().get_height()
+					self.x = (self._x - (renderer.getSize().x - self._w)) / renderer.getSize().x
+					self.y = (self._y - (renderer.getSize().y - self._h >> 1)) / renderer.getSize().y
 				case Location.RIGHT_BOTTOM:
-					self.x = (self._x - (renderer.getSize().x - self._w)) / renderer.getCanvas().get_width()
-					self.y = (self._y - (renderer.getSize().y - self._h)) / renderer.getCanvas().get_height()
+					self.x = (self._x - (renderer.getSize().x - self._w)) / renderer.getSize().x
+					self.y = (self._y - (renderer.getSize().y - self._h)) / renderer.getSize().y
 			self._isMouseIn = True
 			return True
 		return super().isMouseIn(x, y)
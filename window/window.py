@@ -8,7 +8,8 @@ from pygame import Surface
 from LLA import chat_with_ai as ai
 from entity.manager import entityManager
 from interact.interacts import interact
-from render import font, egg_generate
+from render import font
+from render.egg_jobs import EggJob, EggJobStatus
 from render.renderer import renderer
 from save.save import Archive
 from utils.game import game
@@ -55,7 +56,7 @@ class Window(Renderable):
 		渲染背景。可以重写
 		"""
 		if self._texture is not None:
-			w, h = renderer.getCanvas().get_size()
+			w, h = renderer.getSize().getTuple()
 			pos = BlockVector()
 			match self._backgroundLocation:
 				case Location.LEFT_TOP:
@@ -78,15 +79,8 @@ class Window(Renderable):
 					pos = BlockVector(int(w * self._backgroundPosition.x - self._texture.getUiScaledSurface().get_size()[0]), int(h * self._backgroundPosition.y - self._texture.getUiScaledSurface().get_size()[1]))
 			self._texture.renderAtInterface(pos)
 		else:
-			head = self.backgroundColor & 0xff000000
-			if head == 0:
-				renderer.getCanvas().fill(0)
-			else:
-				color = self.backgroundColor & 0xffffff
-				s = Surface(renderer.getCanvas().get_size())
-				s.fill(color)
-				s.set_alpha(head >> 24)
-				renderer.getCanvas().blit(s, (0, 0))
+			w, h = renderer.getSize().getTuple()
+			renderer.fill(0xff000000 if self.backgroundColor & 0xff000000 == 0 else self.backgroundColor, 0, 0, w, h)
 	
 	def render(self, delta: float) -> None:
 		pass
@@ -124,6 +118,12 @@ class Window(Renderable):
 		if interact.keys[pygame.K_ESCAPE].deals():
 			game.setWindow(self.lastOpen)
 	
+	def onClose(self) -> None:
+		"""
+		窗口被关闭或被其他窗口替换时的回调。可以重写。之后仍可能通过lastOpen重新打开
+		"""
+		pass
+	
 	def onResize(self) -> None:
 		"""
 		窗口大小改变时的回调。可以重写，但是不要忘了令所有widgets也onResize一下
@@ -175,7 +175,7 @@ class FloatWindow(Renderable):
 		return len(self._rendering) == 0
 	
 	def render(self, delta: float) -> None:
-		if self._rendering is None:
+		if not self._rendering:  # 空的表面也会被当作一次绘制
 			return
 		info = []
 		maximum = 0
@@ -192,11 +192,11 @@ class FloatWindow(Renderable):
 		x, y = interact.mouse.clone().subtract(0, len(info) * font.realHalfHeight).getTuple()
 		if x < 0:
 			x = 0
-		elif x + maximum > renderer.getCanvas().get_width():
-			x = renderer.getCanvas().get_width() - maximum
+		elif x + maximum > renderer.getSize().x:
+			x = renderer.getSize().x - maximum
 		if y < 0:
 			y = 0
-		renderer.getCanvas().blit(s, (x, y))
+		renderer.blit(s, (x, y), tuple([tuple(i[0].set) for i in info]))
 
 
 class PresetColors:
@@ -584,14 +584,14 @@ class EggFactoryWindow(Window):
 			def __init__(this, x: float, y: float, name: str, description: Description):
 				this.kw = name
 				name = RenderableString('\\01' + name)
-				super().__init__(Location.CENTER, x, y, name.length() / renderer.getCanvas().get_width() + renderer.getSystemScale() / 2000, 0.08, name, description, textLocation=Location.CENTER, texture=None)
+				super().__init__(Location.CENTER, x, y, name.length() / renderer.getSize().x + renderer.getSystemScale() / 2000, 0.08, name, description, textLocation=Location.CENTER, texture=None)
 				
 				def up(mx, my, buttons):
 					if not this.pull:
 						return True
 					this.pull = False
-					if mx > renderer.getCanvas().get_width() * 0.7:
-						res = 10 * (my - (renderer.getCanvas().get_height() >> 2)) / renderer.getCanvas().get_height()
+					if mx > renderer.getSize().x * 0.7:
+						res = 10 * (my - (renderer.getSize().y >> 2)) / renderer.getSize().y
 						res = utils.frange(res, 0, 4.9)
 						if self._selected[0] is this:
 							self._selected[0] = None
@@ -617,7 +617,6 @@ class EggFactoryWindow(Window):
 		
 		self.Pulling = Pulling
 		self._selected: list[Pulling | None] = [None, None, None, None, None]
-		self._product: Surface | int | None = None
 		words = ai.words + ['butterfly-bow', 'runic', 'demonic', 'angelic', 'music', 'C', 'champion', 'second-best', 'hearty', 'grassy', 'rabit', 'flowery']
 		words = random.sample(words, 19) + ['pythonic']
 		ai.asyncWords()
@@ -638,18 +637,16 @@ class EggFactoryWindow(Window):
 		def confirm(x, y, buttons):
 			if buttons[0] == 1 and confirmButton.active:
 				from LLA import ai_decision
-				self._product = 1
-				ai_decision.asyncEgg([j.kw for j in self._selected if j is not None], game.getWorld().getRandom())
-				game.setWindow(EggProductWindow().setWords([j.kw for j in self._selected if j is not None]).setLastOpen(self.lastOpen))
+				keywords = [j.kw for j in self._selected if j is not None]
+				job = ai_decision.asyncEgg(keywords, game.getWorld().getRandom())
+				game.setWindow(EggProductWindow().setWords(keywords).setJob(job).setLastOpen(self.lastOpen))
 				confirmButton.active = False
 			return True
 		
 		confirmButton.onMouseDown = confirm
 	
 	def tick(self) -> None:
-		if egg_generate.eggGenerated:
-			self._product = egg_generate.eggGenerated
-			egg_generate.eggGenerated = None
+		pass  # 不响应ESC
 	
 	def sortPresent(self):
 		xp = -0.4
@@ -690,13 +687,13 @@ class EggFactoryWindow(Window):
 	def renderBackground(self, delta: float, at: BlockVector = BlockVector()) -> None:
 		self._texture.renderAtInterface(BlockVector())
 		size: BlockVector = renderer.getSize()
-		sfc = Surface((w := size.x * 0.3, size.y))
+		sfc = renderer.getOverlay((w := int(size.x * 0.3), size.y), 0x88)
+		sfc.fill(0)
 		h = size.y * 0.1
 		sfc.fill((0xff, 0xff, 0xff), (0, size.y * 0.25, w, h))
 		sfc.fill((0xff, 0xff, 0xff), (0, size.y * 0.45, w, h))
 		sfc.fill((0xff, 0xff, 0xff), (0, size.y * 0.65, w, h))
-		sfc.set_alpha(0x88)
-		renderer.getCanvas().blit(sfc, (size.x * 0.7 + 1, 0))
+		renderer.blit(sfc, (size.x * 0.7 + 1, 0), size.getTuple())
 		renderer.renderString(RenderableString('\\01You are laying'), int(size.x * 0.85), size.y >> 3, 0xffeeeeee, Location.BOTTOM)
 		renderer.renderString(RenderableString('\\01A(An)'), int(size.x * 0.85), size.y >> 3, 0xffeeeeee, Location.TOP)
 		renderer.renderString(RenderableString('\\01Egg'), int(size.x * 0.85), int(size.y * 0.85), 0xffeeeeee, Location.BOTTOM)
@@ -708,6 +705,7 @@ class EggProductWindow(Window):
 		self._texture = resourceManager.getOrNew('window/start')
 		self._product = None
 		self._renderable = None
+		self._job: EggJob | None = None
 		self.keywords = []
 		self._widgets.append(Button(Location.BOTTOM, 0, 0, 1, 0.08, RenderableString("\\.00FCE8AD\\00保存"), Description([RenderableString("\\#ffeeee00永远保存我的蛋！")]), textLocation=Location.CENTER))
 		
@@ -732,11 +730,22 @@ class EggProductWindow(Window):
 		self.keywords = words
 		return self
 	
+	def setJob(self, job: EggJob) -> 'EggProductWindow':
+		"""
+		:param job: 生成中的蛋，完成后显示
+		"""
+		self._job = job
+		return self
+	
 	def tick(self) -> None:
-		if egg_generate.eggGenerated:
-			self._product = egg_generate.eggGenerated
-			self._renderable = pygame.transform.scale_by(self._product, renderer.getSystemScale() * 0.1)
-			egg_generate.eggGenerated = None
+		if self._product is None and self._job is not None and self._job.done():
+			self._product = self._job.result()
+			if self._product is not None:
+				self._renderable = pygame.transform.scale_by(self._product, renderer.getSystemScale() * 0.1)
+	
+	def onClose(self) -> None:
+		if self._job is not None:
+			self._job.cancel()  # 不再等待的蛋不再合成，也不再询问AI；已经完成的不受影响
 	
 	def onResize(self) -> None:
 		super().onResize()
@@ -745,7 +754,9 @@ class EggProductWindow(Window):
 	
 	def render(self, delta: float) -> None:
 		if isinstance(self._renderable, Surface):
-			renderer.getCanvas().blit(self._renderable, (renderer.getCanvas().get_width() - self._renderable.get_width() >> 1, renderer.getCanvas().get_height() - self._renderable.get_height() >> 1))
-			renderer.renderString(RenderableString(f"\\01\\#ff000000Your " + ", ".join(self.keywords) + " egg!"), renderer.getCanvas().get_width() >> 1, renderer.getCanvas().get_height() >> 4, 0xffeeeeee, Location.CENTER)
+			renderer.blit(self._renderable, (renderer.getSize().x - self._renderable.get_width() >> 1, renderer.getSize().y - self._renderable.get_height() >> 1))
+			renderer.renderString(RenderableString(f"\\01\\#ff000000Your " + ", ".join(self.keywords) + " egg!"), renderer.getSize().x >> 1, renderer.getSize().y >> 4, 0xffeeeeee, Location.CENTER)
+		elif self._job is not None and self._job.getStatus() == EggJobStatus.FAILED:
+			renderer.renderString(RenderableString("\\#ff000000鸡蛋生成失败了"), renderer.getSize().x >> 1, renderer.getSize().y >> 3, 0xffeeeeee, Location.CENTER)
 		else:
-			renderer.renderString(RenderableString("\\#ff000000亲爱的AI正在准备你的鸡蛋"), renderer.getCanvas().get_width() >> 1, renderer.getCanvas().get_height() >> 3, 0xffeeeeee, Location.CENTER)
+			renderer.renderString(RenderableString("\\#ff000000亲爱的AI正在准备你的鸡蛋"), renderer.getSize().x >> 1, renderer.getSize().y >> 3, 0xffeeeeee, Location.CENTER)
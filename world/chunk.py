@@ -0,0 +1,185 @@
+"""
+区块存储。地图按16x16划分为区块，每个区块用数组保存方块类型编号，用列表保存方块对象本身。
+读写方块只需要整数坐标，不需要构造BlockVector再取hash。
+"""
+from array import array
+from typing import TYPE_CHECKING, Iterator
+
+from block.manager import blockManager
+
+if TYPE_CHECKING:
+	from block.block import Block
+
+CHUNK_SHIFT: int = 4
+CHUNK_SIZE: int = 1 << CHUNK_SHIFT
+CHUNK_MASK: int = CHUNK_SIZE - 1
+CHUNK_AREA: int = CHUNK_SIZE * CHUNK_SIZE
+
+
+def chunkKey(cx: int, cy: int) -> int:
+	"""
+	区块坐标 -> 字典键。区块坐标范围远小于16位，所以不会冲突
+	"""
+	return (cx << 16) | (cy & 0xffff)
+
+
+class Chunk:
+	"""
+	16x16的方块区域。ids保存方块数字编号（0为空），blocks保存方块对象，二者下标均为 (y & 15) * 16 + (x & 15)
+	"""
+	
+	def __init__(self, cx: int, cy: int):
+		self.cx: int = cx
+		self.cy: int = cy
+		self.ids: array = array('H', bytes(CHUNK_AREA << 1))
+		self.blocks: list['Block | None'] = [None] * CHUNK_AREA
+		self.count: int = 0
+		self.version: int = 0  # 每次内容改变时加一，用于判断地面缓存是否过期
+	
+	def get(self, lx: int, ly: int) -> 'Block | None':
+		return self.blocks[(ly << CHUNK_SHIFT) | lx]
+	
+	def set(self, lx: int, ly: int, block: 'Block | None') -> 'Block | None':
+		"""
+		:return: 被替换掉的方块
+		"""
+		index = (ly << CHUNK_SHIFT) | lx
+		old = self.blocks[index]
+		if old is None:
+			if block is not None:
+				self.count += 1
+		elif block is None:
+			self.count -= 1
+		self.blocks[index] = block
+		self.ids[index] = 0 if block is None else blockManager.getNumericID(block._blockID)
+		if old is not None and old._chunk is self:
+			old._chunk = None
+		if block is not None:
+			block._chunk = self
+		self.version += 1
+		return old
+	
+	def isEmpty(self) -> bool:
+		return self.count == 0
+	
+	def getOrigin(self) -> tuple[int, int]:
+		"""
+		:return: 区块左上角方块坐标
+		"""
+		return self.cx << CHUNK_SHIFT, self.cy << CHUNK_SHIFT
+	
+	def values(self) -> Iterator['Block']:
+		for b in self.blocks:
+			if b is not None:
+				yield b
+
+
+class ChunkedGround:
+	"""
+	按区块存储的地面。替代原先以hash(BlockVector)为键的字典
+	"""
+	
+	def __init__(self):
+		self._chunks: dict[int, Chunk] = {}
+		self._count: int = 0
+	
+	def get(self, x: int, y: int) -> 'Block | None':
+		chunk = self._chunks.get(((x >> CHUNK_SHIFT) << 16) | ((y >> CHUNK_SHIFT) & 0xffff))
+		if chunk is None:
+			return None
+		return chunk.blocks[((y & CHUNK_MASK) << CHUNK_SHIFT) | (x & CHUNK_MASK)]
+	
+	def getID(self, x: int, y: int) -> int:
+		"""
+		:return: 方块数字编号，空方块为0
+		"""
+		chunk = self._chunks.get(((x >> CHUNK_SHIFT) << 16) | ((y >> CHUNK_SHIFT) & 0xffff))
+		if chunk is None:
+			return 0
+		return chunk.ids[((y & CHUNK_MASK) << CHUNK_SHIFT) | (x & CHUNK_MASK)]
+	
+	def set(self, x: int, y: int, block: 'Block | None') -> 'Block | None':
+		"""
+		设置方块。block为None时删除方块
+		:return: 被替换掉的方块
+		"""
+		key = chunkKey(x >> CHUNK_SHIFT, y >> CHUNK_SHIFT)
+		chunk = self._chunks.get(key)
+		if chunk is None:
+			if block is None:
+				return None
+			chunk = self._chunks[key] = Chunk(x >> CHUNK_SHIFT, y >> CHUNK_SHIFT)
+		before = chunk.count
+		old = chunk.set(x & CHUNK_MASK, y & CHUNK_MASK, block)
+		self._count += chunk.count - before
+		if chunk.isEmpty():
+			del self._chunks[key]
+		return old
+	
+	def getChunk(self, cx: int, cy: int) -> Chunk | None:
+		return self._chunks.get(chunkKey(cx, cy))
+	
+	def getChunkAt(self, x: int, y: int) -> Chunk | None:
+		"""
+		获取方块坐标所在的区块
+		"""
+		return self._chunks.get(chunkKey(x >> CHUNK_SHIFT, y >> CHUNK_SHIFT))
+	
+	def chunks(self) -> list[Chunk]:
+		return list(self._chunks.values())
+	
+	def getRow(self, y: int, x1: int, x2: int) -> list['Block | None']:
+		"""
+		获取一行方块，包含两端。空位为None
+		:param y: 行坐标
+		:param x1: 起始列
+		:param x2: 结束列
+		"""
+		ret: list['Block | None'] = []
+		cy = (y >> CHUNK_SHIFT) & 0xffff
+		rowBase = (y & CHUNK_MASK) << CHUNK_SHIFT
+		x = x1
+		while x <= x2:
+			cx = x >> CHUNK_SHIFT
+			end = min(x2, (cx << CHUNK_SHIFT) | CHUNK_MASK)
+			chunk = self._chunks.get((cx << 16) | cy)
+			if chunk is None:
+				ret.extend([None] * (end - x + 1))
+			else:
+				ret.extend(chunk.blocks[rowBase | (x & CHUNK_MASK):(rowBase | (end & CHUNK_MASK)) + 1])
+			x = end + 1
+		return ret
+	
+	def region(self, x1: int, y1: int, x2: int, y2: int) -> Iterator['Block']:
+		"""
+		按区块遍历矩形范围内的所有非空方块，包含边界。遍历顺序不保证按行
+		"""
+		for cy in range(y1 >> CHUNK_SHIFT, (y2 >> CHUNK_SHIFT) + 1):
+			for cx in range(x1 >> CHUNK_SHIFT, (x2 >> CHUNK_SHIFT) + 1):
+				chunk = self._chunks.get(chunkKey(cx, cy))
+				if chunk is None:
+					continue
+				ox, oy = chunk.getOrigin()
+				lx1, lx2 = max(x1 - ox, 0), min(x2 - ox, CHUNK_MASK)
+				ly1, ly2 = max(y1 - oy, 0), min(y2 - oy, CHUNK_MASK)
+				blocks = chunk.blocks
+				for ly in range(ly1, ly2 + 1):
+					base = ly << CHUNK_SHIFT
+					for b in blocks[base + lx1:base + lx2 + 1]:
+						if b is not None:
+							yield b
+	
+	def values(self) -> Iterator['Block']:
+		"""
+		遍历所有非空方块。遍历期间不可以新增区块
+		"""
+		for chunk in self._chunks.values():
+			for b in chunk.blocks:
+				if b is not None:
+					yield b
+	
+	def __len__(self) -> int:
+		return self._count
+	
+	def __str__(self) -> str:
+		return f'ChunkedGround(chunks = {len(self._chunks)}, blocks = {self._count})'
@@ -0,0 +1,136 @@
+"""
+实体空间索引。按方块格子把实体分桶，范围查询只需要看附近的格子，不需要遍历全部实体。
+"""
+import math
+from typing import TYPE_CHECKING, Callable
+
+from utils.vector import Vector
+
+if TYPE_CHECKING:
+	from entity.entity import Entity
+
+
+def cellKey(cx: int, cy: int) -> int:
+	return (cx << 16) | (cy & 0xffff)
+
+
+class EntityGrid:
+	"""
+	均匀网格，格子大小为一个方块。实体位置改变后需要调用update
+	查询可能在主线程（鼠标事件）中进行，所以遍历格子时先复制为元组
+	"""
+	
+	def __init__(self):
+		self._cells: dict[int, set['Entity']] = {}
+		self._keys: dict['Entity', int] = {}
+	
+	def insert(self, entity: 'Entity') -> None:
+		p = entity._position
+		key = cellKey(math.floor(p.x), math.floor(p.y))
+		self._keys[entity] = key
+		cell = self._cells.get(key)
+		if cell is None:
+			self._cells[key] = {entity}
+		else:
+			cell.add(entity)
+	
+	def remove(self, entity: 'Entity') -> None:
+		key = self._keys.pop(entity, None)
+		if key is None:
+			return
+		cell = self._cells.get(key)
+		if cell is None:
+			return
+		cell.discard(entity)
+		if len(cell) == 0:
+			del self._cells[key]
+	
+	def update(self, entity: 'Entity') -> None:
+		"""
+		实体移动后调用。不在索引中的实体（例如玩家）会被忽略
+		"""
+		old = self._keys.get(entity)
+		if old is None:
+			return
+		p = entity._position
+		key = cellKey(math.floor(p.x), math.floor(p.y))
+		if key == old:
+			return
+		cell = self._cells.get(old)
+		if cell is not None:
+			cell.discard(entity)
+			if len(cell) == 0:
+				del self._cells[old]
+		self._keys[entity] = key
+		cell = self._cells.get(key)
+		if cell is None:
+			self._cells[key] = {entity}
+		else:
+			cell.add(entity)
+	
+	def clear(self) -> None:
+		self._cells.clear()
+		self._keys.clear()
+	
+	def queryRect(self, x1: float, y1: float, x2: float, y2: float) -> list['Entity']:
+		"""
+		查找矩形范围内的实体，包含边界
+		"""
+		ret: list['Entity'] = []
+		cx1, cx2 = math.floor(x1), math.floor(x2)
+		cy1, cy2 = math.floor(y1), math.floor(y2)
+		if (cx2 - cx1 + 1) * (cy2 - cy1 + 1) > len(self._keys):  # 范围比实体数还大，直接遍历更快
+			for e in tuple(self._keys):
+				p = e._position
+				if x1 <= p.x <= x2 and y1 <= p.y <= y2:
+					ret.append(e)
+			return ret
+		cells = self._cells
+		for cx in range(cx1, cx2 + 1):
+			for cy in range(cy1, cy2 + 1):
+				cell = cells.get((cx << 16) | (cy & 0xffff))
+				if cell is None:
+					continue
+				for e in tuple(cell):
+					p = e._position
+					if x1 <= p.x <= x2 and y1 <= p.y <= y2:
+						ret.append(e)
+		return ret
+	
+	def queryRadius(self, center: Vector, radius: float) -> list['Entity']:
+		"""
+		查找圆形范围内的实体（欧氏距离，包含边界）
+		"""
+		r2 = radius * radius
+		cx, cy = center.x, center.y
+		return [e for e in self.queryRect(cx - radius, cy - radius, cx + radius, cy + radius) if (e._position.x - cx) ** 2 + (e._position.y - cy) ** 2 <= r2]
+	
+	def nearest(self, center: Vector, maxRadius: float, condition: Callable[['Entity'], bool] | None = None) -> 'Entity | None':
+		"""
+		由近到远按圈查找最近的实体
+		:param center: 中心点
+		:param maxRadius: 最大查找距离
+		:param condition: 过滤条件，默认不过滤
+		:return: 最近的实体，没有则返回None
+		"""
+		ox, oy = math.floor(center.x), math.floor(center.y)
+		best: 'Entity | None' = None
+		bestDistance: float = maxRadius * maxRadius
+		cells = self._cells
+		for ring in range(0, math.ceil(maxRadius) + 2):
+			if best is not None and (ring - 1) ** 2 > bestDistance:  # 更外圈的格子不可能更近
+				break
+			for cx in range(ox - ring, ox + ring + 1):
+				edge = cx == ox - ring or cx == ox + ring
+				for cy in (range(oy - ring, oy + ring + 1) if edge else (oy - ring, oy + ring)):
+					cell = cells.get((cx << 16) | (cy & 0xffff))
+					if cell is None:
+						continue
+					for e in tuple(cell):
+						d = (e._position.x - center.x) ** 2 + (e._position.y - center.y) ** 2
+						if d <= bestDistance and (condition is None or condition(e)):
+							best, bestDistance = e, d
+		return best
+	
+	def __len__(self) -> int:
+		return len(self._keys)
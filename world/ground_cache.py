@@ -0,0 +1,169 @@
+"""
+地面缓存。每个区块按当前地图缩放预先画成一张表面，静止画面每帧只需要几次大块blit。
+"""
+from typing import TYPE_CHECKING
+
+import pygame.image
+from pygame import Surface
+
+from render.renderer import renderer
+from utils.vector import BlockVector
+from world.chunk import CHUNK_MASK, CHUNK_SHIFT, Chunk, ChunkedGround, chunkKey
+
+if TYPE_CHECKING:
+	from block.block import Block
+
+
+class _Entry:
+	def __init__(self, chunk: Chunk, version: int, surface: Surface, holders: list[tuple['Block', bool]]):
+		self.chunk: Chunk = chunk
+		self.version: int = version
+		self.surface: Surface = surface
+		self.holders: list[tuple['Block', bool]] = holders  # (方块, 是否需要逐格绘制方块本身)
+		self.origin: BlockVector = BlockVector(*chunk.getOrigin())
+
+
+class GroundCache:
+	"""
+	只缓存方块本身的纹理。叠加元素（栅栏等）的纹理会超出方块并遮挡实体，仍由World.render逐行绘制；
+	纹理有偏移或大于一格的方块同样逐格绘制，不会在区块边缘被截断。
+	区块表面以KEY为透明色，空位和纹理的透明部分不会盖住下面的内容。
+	区块内容改变（Chunk.version变化）时重绘该区块；地图缩放改变时全部重绘。
+	只在渲染线程中使用
+	"""
+	MAX_SURFACE_SIZE: int = 2048
+	"""
+	区块表面边长上限（像素）。放大到超过上限时不使用缓存，此时屏幕内区块很少，逐格绘制也不慢
+	"""
+	
+	KEY: tuple[int, int, int] = (0xff, 0x00, 0xff)
+	"""
+	区块表面的透明色。纹理中这个颜色的像素也会变成透明
+	"""
+	
+	def __init__(self):
+		self._entries: dict[int, _Entry] = {}
+		self._scale: int = 0
+	
+	def usable(self) -> bool:
+		return renderer.getMapScale() << CHUNK_SHIFT <= self.MAX_SURFACE_SIZE
+	
+	def clear(self) -> None:
+		self._entries.clear()
+	
+	def render(self, ground: ChunkedGround, x1: int, y1: int, x2: int, y2: int) -> list[tuple['Block', bool]]:
+		"""
+		绘制范围内的区块
+		:return: 范围内还需要逐行绘制的方块，按y排序：(方块, True)需要绘制整个方块，(方块, False)只需要绘制叠加元素
+		"""
+		scale = renderer.getMapScale()
+		if scale != self._scale:
+			self._entries.clear()
+			self._scale = scale
+		holders: list[tuple['Block', bool]] = []
+		visible: set[int] = set()
+		for cy in range(y1 >> CHUNK_SHIFT, (y2 >> CHUNK_SHIFT) + 1):
+			for cx in range(x1 >> CHUNK_SHIFT, (x2 >> CHUNK_SHIFT) + 1):
+				chunk = ground.getChunk(cx, cy)
+				if chunk is None:
+					continue
+				key = chunkKey(cx, cy)
+				visible.add(key)
+				entry = self._entries.get(key)
+				if entry is None or entry.chunk is not chunk or entry.version != chunk.version:
+					entry = self._entries[key] = self._build(chunk, scale)
+				renderer.renderAsBlock(entry.surface, entry.origin)
+				for h in entry.holders:
+					p = h[0]._position
+					if x1 <= p.x <= x2 and y1 <= p.y <= y2:
+						holders.append(h)
+		if len(self._entries) > (len(visible) << 1) + 8:  # 丢掉屏幕外的区块，避免缩放到很小后跑遍地图时占用过多内存
+			for key in [k for k in self._entries if k not in visible]:
+				del self._entries[key]
+		holders.sort(key=lambda h: h[0]._position.y)
+		return holders
+	
+	def compareWithCells(self, ground: ChunkedGround, x1: int, y1: int, x2: int, y2: int) -> int:
+		"""
+		调试用，需要在绘制中调用。把范围内的地面分别逐格绘制和通过缓存绘制，比较画布上的结果
+		:return: 不同的像素数
+		"""
+		canvas = renderer.getCanvas()
+		canvas.fill(0)
+		for j in range(y1, y2 + 1):
+			for b in ground.getRow(j, x1, x2):
+				if b is not None:
+					b.render(0)
+		cells = pygame.image.tobytes(canvas, 'RGB')
+		canvas.fill(0)
+		for b, whole in self.render(ground, x1, y1, x2, y2):
+			if whole:
+				b.render(0)
+			else:
+				b.renderHolding(0)
+		cached = pygame.image.tobytes(renderer.getCanvas(), 'RGB')
+		return sum(1 for i in range(0, len(cells), 3) if cells[i:i + 3] != cached[i:i + 3])
+	
+	@staticmethod
+	def _build(chunk: Chunk, scale: int) -> _Entry:
+		version = chunk.version  # 先读版本，绘制途中游戏线程修改了区块的话下一帧会再重绘
+		surface = Surface((scale << CHUNK_SHIFT, scale << CHUNK_SHIFT))
+		holders: list[tuple['Block', bool]] = []
+		blits: list[tuple[Surface, tuple[int, int]]] = []
+		transparent = False
+		for i, b in enumerate(chunk.blocks):
+			if b is None:
+				transparent = True
+				continue
+			texture = b.getTexture()
+			src = texture.getMapScaledSurface()
+			if src is None:
+				src = texture.getSurface()
+			if texture._offset is not None or src.get_width() > scale or src.get_height() > scale:
+				holders.append((b, True))  # 会画到格子外面，交给World.render逐格绘制
+				transparent = True
+				continue
+			if src.get_colorkey() is not None or src.get_width() < scale or src.get_height() < scale:
+				transparent = True
+			blits.append((src, ((i & CHUNK_MASK) * scale, (i >> CHUNK_SHIFT) * scale)))
+			if len(b.getHolding()) > 0:
+				holders.append((b, False))
+		if transparent:
+			surface.fill(GroundCache.KEY)
+			surface.set_colorkey(GroundCache.KEY)
+		surface.blits(blits, False)
+		return _Entry(chunk, version, surface, holders)
+
+
+if __name__ == '__main__':  # python -m world.ground_cache 检查缓存与逐格绘制的结果一致
+	import os
+	os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+	pygame.display.init()
+	renderer.setScreen(pygame.display.set_mode((800, 600)))
+	from render.resource import resourceManager
+	resourceManager.normalizeFormat()
+	import random
+	from utils.vector import Vector
+	from block.manager import blockManager
+	from block.block import GateBlock, Fence
+	ground = ChunkedGround()
+	rd = random.Random(1)
+	for j in range(-10, 10):
+		for i in range(-10, 10):
+			ground.set(i, j, blockManager.dic[rd.choice(list(blockManager.dic.keys()))](BlockVector(i, j)))
+	ground.set(3, 3, None)  # 空位
+	ground.set(4, 4, GateBlock(BlockVector(4, 4)))  # 带透明色的纹理
+	ground.get(5, 5).holdAppend(Fence(BlockVector(5, 5)))  # 叠加元素
+	resourceManager.getOrNew('block/path').setOffset(Vector(0, -4))  # 有偏移的纹理
+	failed = 0
+	for customScale in (1, 1.5):
+		renderer.setCustomMapScale(customScale)
+		renderer.peekScaleChange()
+		renderer.dealScaleChange()
+		renderer.begin(0, False)
+		diff = GroundCache().compareWithCells(ground, -12, -12, 12, 12)
+		renderer._isRendering = False
+		print(f"map scale {renderer.getMapScale()}: {diff} pixels differ")
+		failed += diff
+	raise SystemExit(1 if failed else 0)
+
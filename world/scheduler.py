@@ -0,0 +1,230 @@
+"""
+tick调度。玩家附近的实体和方块每tick都运行，远处的按间隔轮流运行，更远的休眠。
+远处部分受每tick时间预算限制，超出预算的留到下一tick继续，保证游戏线程的44ms节拍不被拖慢。
+"""
+import math
+import random
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Union
+
+from render.renderer import renderer
+from save import configs
+from utils.util import utils
+from world.chunk import CHUNK_AREA, CHUNK_SIZE, Chunk, ChunkedGround
+
+if TYPE_CHECKING:
+	from entity.entity import Entity, Player
+	from world.grid import EntityGrid
+
+
+class TickQueue:
+	"""
+	每个世界各自持有。记录需要tick的实体，以及远处实体和区块的轮转队列
+	"""
+	
+	def __init__(self):
+		self.entities: set['Entity'] = set['Entity']()
+		self.pinned: set['Entity'] = set['Entity']()  # 要求始终活跃的实体，例如跟随玩家的公鸡
+		self._queue: deque['Entity'] = deque['Entity']()
+		self._queued: set['Entity'] = set['Entity']()
+		self._chunks: deque[Chunk] = deque[Chunk]()
+		self._queuedChunks: set[Chunk] = set[Chunk]()
+	
+	def add(self, entity: 'Entity') -> None:
+		self.entities.add(entity)
+		if entity not in self._queued:
+			self._queued.add(entity)
+			self._queue.append(entity)
+	
+	def discard(self, entity: 'Entity') -> None:
+		"""
+		队列中的实体在轮到时才会被移除
+		"""
+		self.entities.discard(entity)
+		self.pinned.discard(entity)
+	
+	def __len__(self) -> int:
+		return len(self.entities)
+
+
+class TickScheduler:
+	def __init__(self):
+		self.activeRadius: float = 24
+		"""
+		活跃半径（方块）。范围内的实体和区块每tick都运行
+		"""
+		self.sleepRadius: float = 64
+		"""
+		休眠半径（方块）。超出的实体和区块不运行
+		"""
+		self.farInterval: int = 4
+		"""
+		活跃半径和休眠半径之间的部分，每隔多少tick运行一次
+		"""
+		self.budget: int = 0
+		"""
+		远处部分每tick可用的时间（纳秒），0为不限制。活跃部分不受限制
+		"""
+		self.randomTickSpeed: int = 3
+		"""
+		每个区块每tick随机抽取的方块数，0为关闭随机刻
+		"""
+		self.counts: dict[str, int] = {'active': 0, 'far': 0, 'sleeping': 0, 'deferred': 0, 'block': 0, 'random': 0}
+		"""
+		上一tick各类别的运行次数，用于调试显示
+		"""
+		self._tickCount: int = 0
+		self._start: int = 0
+	
+	def begin(self) -> None:
+		self._tickCount += 1
+		self._start = time.perf_counter_ns()
+		for k in self.counts:
+			self.counts[k] = 0
+	
+	def _overBudget(self) -> bool:
+		return self.budget != 0 and time.perf_counter_ns() - self._start > self.budget
+	
+	def tickEntities(self, player: Union['Player', None], grid: 'EntityGrid', queue: TickQueue) -> None:
+		counts = self.counts
+		if player is None:
+			for e in queue.entities.copy():
+				e.passTick()
+			counts['active'] += len(queue.entities)
+			return
+		center = player._position
+		entities = queue.entities
+		active = [e for e in grid.queryRadius(center, self.activeRadius) if e in entities]
+		activeSet = set(active)
+		for e in queue.pinned.copy():
+			if e not in activeSet:
+				if e.alwaysActive():
+					active.append(e)
+					activeSet.add(e)
+				else:
+					queue.pinned.discard(e)
+		for e in active:
+			e.passTick()
+		counts['active'] += len(active)
+		# 远处实体轮转，每tick处理队列的1/farInterval
+		rotating = queue._queue
+		n = math.ceil(len(rotating) / self.farInterval)
+		sleep2 = self.sleepRadius * self.sleepRadius
+		for i in range(n):
+			if self._overBudget():
+				counts['deferred'] += n - i
+				break
+			e = rotating.popleft()
+			if e not in entities:
+				queue._queued.discard(e)
+				continue
+			rotating.append(e)
+			if e in activeSet:
+				continue
+			if e.alwaysActive():
+				queue.pinned.add(e)
+				e.passTick()
+				counts['active'] += 1
+				continue
+			p = e._position
+			if (p.x - center.x) ** 2 + (p.y - center.y) ** 2 > sleep2:
+				counts['sleeping'] += 1
+				continue
+			e.passTick()
+			counts['far'] += 1
+	
+	@staticmethod
+	def _tickChunk(chunk: Chunk) -> int:
+		count = 0
+		for b in chunk.values():
+			if b.ticking or b._holding:
+				b.passTick()
+				count += 1
+		return count
+	
+	def tickBlocks(self, player: Union['Player', None], ground: ChunkedGround, queue: TickQueue) -> None:
+		if player is None:
+			for b in ground.values():
+				if b.ticking or b._holding:
+					b.passTick()
+					self.counts['block'] += 1
+			return
+		half = CHUNK_SIZE / 2
+		center = player._position
+		active2 = (self.activeRadius + half * 1.5) ** 2
+		sleep2 = (self.sleepRadius + half * 1.5) ** 2
+		count = 0
+		rotating = queue._chunks
+		queued = queue._queuedChunks
+		for chunk in ground.chunks():
+			if chunk not in queued:
+				queued.add(chunk)
+				rotating.append(chunk)
+			ox, oy = chunk.getOrigin()
+			if (ox + half - center.x) ** 2 + (oy + half - center.y) ** 2 <= active2:
+				count += self._tickChunk(chunk)
+		# 远处区块轮转，每tick处理队列的1/farInterval。超出预算时停在这里，下一tick从没处理的区块继续
+		n = math.ceil(len(rotating) / self.farInterval)
+		for i in range(n):
+			if self._overBudget():
+				self.counts['deferred'] += n - i
+				break
+			chunk = rotating.popleft()
+			if ground.getChunk(chunk.cx, chunk.cy) is not chunk:  # 区块已被删除
+				queued.discard(chunk)
+				continue
+			rotating.append(chunk)
+			ox, oy = chunk.getOrigin()
+			d = (ox + half - center.x) ** 2 + (oy + half - center.y) ** 2
+			if d <= active2 or d > sleep2:
+				continue
+			count += self._tickChunk(chunk)
+		self.counts['block'] += count
+	
+	def tickRandom(self, ground: ChunkedGround, rd: random.Random) -> None:
+		"""
+		随机刻。每个区块随机抽取randomTickSpeed个位置，调用其中方块的randomTick。重复抽中同一位置也算多次
+		"""
+		speed = self.randomTickSpeed
+		if speed == 0:
+			return
+		count = 0
+		for chunk in ground.chunks():
+			blocks = chunk.blocks
+			for _ in range(speed):
+				b = blocks[int(rd.random() * CHUNK_AREA)]
+				if b is not None:
+					b.randomTick()
+					count += 1
+		self.counts['random'] += count
+	
+	def randomTickScale(self) -> float:
+		"""
+		:return: 方块平均多少tick被随机刻选中一次。把“每tick概率”换算为“每次随机刻概率”时乘以这个值
+		"""
+		return CHUNK_AREA / self.randomTickSpeed if self.randomTickSpeed != 0 else 0
+	
+	def describe(self) -> str:
+		c = self.counts
+		return f"tick {c['active']}/{c['far']}/{c['sleeping']} +{c['deferred']} blk {c['block']}/{c['random']}"
+	
+	def readConfig(self, config: dict[str, any]) -> None:
+		self.activeRadius = configs.readElseDefault(config, "tickActiveRadius", 24, lambda f: utils.frange(f, 8, 256))
+		self.sleepRadius = configs.readElseDefault(config, "tickSleepRadius", 64, lambda f: utils.frange(f, self.activeRadius, 1024))
+		self.farInterval = configs.readElseDefault(config, "tickFarInterval", 4, lambda i: int(utils.frange(i, 1, 100)))
+		self.randomTickSpeed = configs.readElseDefault(config, "randomTickSpeed", 3, lambda i: int(utils.frange(i, 0, CHUNK_AREA)))
+		self.budget = int(configs.readElseDefault(config, "tickBudget", 0, lambda f: utils.frange(f, 0, 44)) * 1_000_000)
+	
+	def writeConfig(self) -> dict[str, any]:
+		return {
+			"tickActiveRadius": self.activeRadius,
+			"tickSleepRadius": self.sleepRadius,
+			"tickFarInterval": self.farInterval,
+			"tickBudget": self.budget / 1_000_000,
+			"randomTickSpeed": self.randomTickSpeed,
+		}
+
+
+tickScheduler: TickScheduler = TickScheduler()
+renderer.addDebugInfo('tick', tickScheduler.describe)
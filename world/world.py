@@ -1,5 +1,6 @@
+import math
 import random
-from typing import Union, TYPE_CHECKING
+from typing import Union, TYPE_CHECKING, Callable
 
 import pygame
 
@@ -11,6 +12,7 @@ from save.save import Archive
 from utils.util import utils
 from utils.game import game
 from utils.text import RenderableString
+from music.music import Music_player
 
 if TYPE_CHECKING:
 	from entity.entity import Entity, Player
@@ -18,6 +20,10 @@ if TYPE_CHECKING:
 from render.renderable import Renderable
 from utils.vector import Vector, BlockVector
 from block.block import Block, BrickWallBlock, BrickGroundBlock, GateBlock
+from world.chunk import ChunkedGround
+from world.grid import EntityGrid
+from world.ground_cache import GroundCache
+from world.scheduler import TickQueue, tickScheduler
 
 
 class World(Renderable):
@@ -27,7 +33,10 @@ class World(Renderable):
 		self._player: Union['Player', None] = None
 		self._id: int = worldID
 		self._entityList: set['Entity'] = set['Entity']()
-		self._ground: dict[int, Block] = dict[int, Block]()
+		self._tickQueue: TickQueue = TickQueue()  # 需要tick的实体，是_entityList的子集
+		self._entityGrid: EntityGrid = EntityGrid()
+		self._ground: ChunkedGround = ChunkedGround()
+		self._groundCache: GroundCache = GroundCache()
 		self._seed: random.Random = random.Random(seed or 0)
 		self._seedNumber: int = seed or 0
 		self.maxUuid: int = 0
@@ -47,17 +56,16 @@ class World(Renderable):
 		for i in range(-10, 10):
 			for j in range(-10, 10):
 				v = BlockVector(i, j)
-				w._ground[hash(v)] = blockManager.dic[rd.sample(blockManager.dic.keys(), 1)[0]](v)
+				w._ground.set(i, j, blockManager.dic[rd.sample(list(blockManager.dic.keys()), 1)[0]](v))  # 保持注册顺序，相同的种子生成相同的地图
 		w.addEntity(entityManager.get('enemy.dog')())
 		return w
 	
 	def tick(self) -> None:
-		for e in self._entityList.copy():
-			e.passTick()
-		for b in self._ground.values():
-			if b is None:
-				continue
-			b.passTick()
+		tickScheduler.begin()
+		tickScheduler.tickEntities(self._player, self._entityGrid, self._tickQueue)
+		self.processPickup()
+		tickScheduler.tickBlocks(self._player, self._ground, self._tickQueue)
+		tickScheduler.tickRandom(self._ground, self._seed)
 		if self._player is not None:
 			self._player.passTick()
 		if game.getWindow() is None:
@@ -98,17 +106,25 @@ class World(Renderable):
 			newList.append(self._player)
 		newList.sort(key=lambda k: k.updatePosition().y)
 		newListLength = len(newList)
+		renderer.beginBatch()  # 方块和实体的贴图合批绘制，穿插的其他绘制会先把已排队的画出，顺序不变
+		holders = self._groundCache.render(self._ground, block1.x, block1.y, block2.x, block2.y) if self._groundCache.usable() else None
+		holdersLength = 0 if holders is None else len(holders)
+		h = 0
 		e = 0
 		j = block1.y
 		while j <= block2.y:
-			i = block1.x
-			while i <= block2.x:
-				b = self._ground.get(hash(BlockVector(i, j)))
-				if b is None:
-					i += 1
-					continue
-				b.render(delta)
-				i += 1
+			if holders is None:
+				for b in self._ground.getRow(j, block1.x, block2.x):
+					if b is not None:
+						b.render(delta)
+			else:  # 方块本身已由缓存画好，只按行补上叠加元素，保持与实体的遮挡关系
+				while h < holdersLength and holders[h][0]._position.y <= j:
+					b, whole = holders[h]
+					if whole:
+						b.render(delta)
+					else:
+						b.renderHolding(delta)
+					h += 1
 			j += 1
 			while e < newListLength:
 				if newList[e].updatePosition().y <= j:
@@ -116,6 +132,7 @@ class World(Renderable):
 					e += 1
 				else:
 					break
+		renderer.endBatch()
 		self._player.renderSkill(delta)
 	
 	def setPlayer(self, player: 'Player') -> None:
@@ -126,8 +143,33 @@ class World(Renderable):
 	def getPlayer(self) -> Union['Player', None]:
 		return self._player
 	
-	def addEntity(self, entity: 'Entity') -> None:
+	def processPickup(self) -> None:
+		"""
+		按玩家位置统一结算拾取。每tick只做一次范围查询，远处的可拾取实体没有任何开销
+		"""
+		player = self._player
+		if player is None:
+			return
+		from entity.entity import Collectible
+		pos = player._position
+		sounds: set[int] = set()
+		for e in self._entityGrid.queryRadius(pos, Collectible.pickRange):
+			if not isinstance(e, Collectible) or e._position.distanceManhattan(pos) > e.pickRange:
+				continue
+			sounds.add(e.pickSound)
+			e.onPick(player)
+			self.removeEntity(e)
+		for sound in sounds:
+			Music_player.sound_play(sound)
+	
+	def _attachEntity(self, entity: 'Entity') -> None:
 		self._entityList.add(entity)
+		if entity.ticking:
+			self._tickQueue.add(entity)
+		self._entityGrid.insert(entity)
+	
+	def addEntity(self, entity: 'Entity') -> None:
+		self._attachEntity(entity)
 		if entity.uuid == -1:
 			entity.uuid = self.newUuid()
 		else:
@@ -135,19 +177,77 @@ class World(Renderable):
 	
 	def removeEntity(self, entity: 'Entity') -> None:
 		self._entityList.remove(entity)
+		self._tickQueue.discard(entity)
+		self._entityGrid.remove(entity)
+	
+	def updateEntity(self, entity: 'Entity') -> None:
+		"""
+		实体位置改变后调用，用于维护空间索引。不在本世界中的实体会被忽略
+		"""
+		self._entityGrid.update(entity)
 	
 	def getEntities(self) -> list['Entity']:
 		return list(self._entityList)
 	
+	def getEntityCount(self) -> int:
+		"""
+		实体数量。不像getEntities那样复制列表
+		"""
+		return len(self._entityList)
+	
+	def queryRadius(self, center: Vector, radius: float) -> list['Entity']:
+		"""
+		查找圆形范围内的实体，不包括玩家
+		:param center: 圆心
+		:param radius: 半径
+		"""
+		return self._entityGrid.queryRadius(center, radius)
+	
+	def queryRect(self, x1: float, y1: float, x2: float, y2: float) -> list['Entity']:
+		"""
+		查找矩形范围内的实体，包含边界，不包括玩家
+		"""
+		return self._entityGrid.queryRect(x1, y1, x2, y2)
+	
+	def nearest(self, center: Vector, maxRadius: float, condition: Callable[['Entity'], bool] | None = None) -> Union['Entity', None]:
+		"""
+		查找最近的实体，不包括玩家
+		:param center: 中心点
+		:param maxRadius: 最大查找距离
+		:param condition: 过滤条件，默认不过滤
+		"""
+		return self._entityGrid.nearest(center, maxRadius, condition)
+	
 	def getBlockAt(self, point: Vector | BlockVector) -> Block | None:
-		return self._ground.get(hash(point if isinstance(point, BlockVector) else point.clone().getBlockVector()))
+		if isinstance(point, BlockVector):
+			return self._ground.get(point.x, point.y)
+		return self._ground.get(math.floor(point.x), math.floor(point.y))
 	
-	def setBlockAt(self, point: BlockVector, block: Block) -> None:
+	def setBlockAt(self, point: BlockVector, block: Block | None) -> None:
 		"""
-		设置方块
+		设置方块。block为None时删除方块
 		"""
-		# b = self._ground[hash(point)]
-		self._ground[hash(point)] = block
+		self._ground.set(point.x, point.y, block)
+	
+	def getBlocksInRange(self, x1: int, y1: int, x2: int, y2: int) -> list[Block]:
+		"""
+		获取矩形范围内的所有方块，包含边界。按区块批量读取，不构造BlockVector
+		:param x1: 左边界
+		:param y1: 上边界
+		:param x2: 右边界
+		:param y2: 下边界
+		:return: 范围内所有非空方块，不保证顺序
+		"""
+		return list(self._ground.region(x1, y1, x2, y2))
+	
+	def getBlockRow(self, y: int, x1: int, x2: int) -> list[Block | None]:
+		"""
+		获取一行方块，包含两端，空位为None。用于按行渲染
+		"""
+		return self._ground.getRow(y, x1, x2)
+	
+	def getGround(self) -> ChunkedGround:
+		return self._ground
 	
 	def getRandom(self) -> random.Random:
 		return self._seed
@@ -182,7 +282,8 @@ class World(Renderable):
 				blockPos: BlockVector = BlockVector(i, j)
 				hitResult: Vector | None = blockPos.getHitPoint(start, direction)
 				if hitResult is not None and hitResult.length() < length:
-					result.append((self._ground[hash(blockPos)] if hash(blockPos) in self._ground.keys() else blockPos.clone(), hitResult.clone()))
+					block: Block | None = self._ground.get(i, j)
+					result.append((blockPos.clone() if block is None else block, hitResult.clone()))
 		return result
 	
 	def save(self) -> None:
@@ -195,8 +296,8 @@ class World(Renderable):
 		archive.dic['maxUuid'] = self.maxUuid
 		archive.dic['ending'] = self.ending
 		archive.dic['seed_num'] = self._seedNumber
-		for p, b in self._ground.items():
-			w[p] = b.save()
+		for b in self._ground.values():
+			w[hash(b.getBlockPosition())] = b.save()
 		for f in self._entityList:
 			e.append(f.save())
 		utils.info(archive.dic['id'])
@@ -215,12 +316,12 @@ class World(Renderable):
 		for i in (dictWorld := d['world']):
 			dictBlock = dictWorld[i]
 			block = blockManager.get(dictBlock['id']).load(dictBlock)
-			world._ground[hash(block.getBlockPosition())] = block
+			world.setBlockAt(block.getBlockPosition(), block)
 		from entity.entity import Rooster
 		from entity.enemy import EnemyChicken
 		roosters = []
 		for e in d['entity']:
-			world._entityList.add(e := entityManager.get(e['id']).load(e))
+			world._attachEntity(e := entityManager.get(e['id']).load(e))
 			if isinstance(e, Rooster):
 				roosters.append(e)
 		for e in roosters:
@@ -296,14 +397,14 @@ class DynamicWorld(World):
 			flag = (i == 3 or i == -4)
 			for j in range(-4, 4):
 				pos = BlockVector(i, j)
-				self._ground[hash(pos)] = (block := GrassBlock(pos))
+				self.setBlockAt(pos, block := GrassBlock(pos))
 				if flag or j == -4 or j == 3:
 					block.holdAppend(Fence(pos) if pos.normalizeClone().subtract(direction).length() > 0.4 else SafetyLine(pos))
 		for i in range(-10, 10):
 			flag = (i == -10 or i == 9)
 			for j in range(-7, 8):
 				pos = BlockVector(center2.x + i, center2.y + j)
-				self._ground[hash(pos)] = (block := GrassBlock(pos))
+				self.setBlockAt(pos, block := GrassBlock(pos))
 				if flag or j == -7 or j == 7:
 					block.holdAppend(Fence(pos) if (center2 - pos).normalizeClone().subtract(direction2).length() > 0.4 else SafetyLine(pos))
 				else:
@@ -389,8 +490,6 @@ class DynamicWorld(World):
 		
 		# 第一段实体
 		for j in self._ground.values():
-			if j is None:
-				continue
 			if isinstance(j, BrickGroundBlock):
 				p = j.getBlockPosition()
 				for vec in [
@@ -403,7 +502,7 @@ class DynamicWorld(World):
 					BlockVector(p.x + 1, p.y),
 					BlockVector(p.x + 1, p.y + 1),
 				]:
-					blk = self._ground.get(hash(vec))
+					blk = self.getBlockAt(vec)
 					if blk is not None and blk._blockID.startswith('nature'):
 						if self.getBlockAt(p).tryHold(fence := SafetyLine(p)):
 							self.getBlockAt(p).holdAppend(fence)
@@ -430,8 +529,6 @@ class DynamicWorld(World):
 		
 		while True:
 			for j in self._ground.values():
-				if j is None:
-					continue
 				if not isinstance(j, BrickGroundBlock):
 					continue
 				if self._seed.random() < 0.01:
@@ -457,12 +554,12 @@ class WitchWorld(World):
 			for j in range(-1, 1):
 				v = BlockVector(i, j)
 				block = blockManager.dic.get('witch.blue')(v)
-				self._ground[hash(v)] = block
+				self.setBlockAt(v, block)
 		for i in range(-1, 1):
 			for j in range(-20, 20):
 				v = BlockVector(i, j)
 				block = blockManager.dic.get('witch.blue')(v)
-				self._ground[hash(v)] = block
+				self.setBlockAt(v, block)
 		
 		player = entityManager.get('player')(Vector(1, 1))
 		self.setPlayer(player)